@@ -0,0 +1,405 @@
+"""Performance benchmarks of the ONEKEY client against a local mock platform.
+
+Results are written as JSON together with the git revision and the benchmark
+parameters, so that runs on different commits can be compared with the
+``compare`` subcommand::
+
+    python benchmarks/bench.py run --output before.json
+    git checkout other-branch
+    python benchmarks/bench.py run --output after.json
+    python benchmarks/bench.py compare before.json after.json
+"""
+
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+import httpx
+from mock_server import (
+    ANALYSIS_CONFIGURATION_ID,
+    FIRMWARE_ID,
+    PRODUCT_GROUP_ID,
+    MockConfig,
+    MockServer,
+)
+
+from onekey_client import Client, FirmwareMetadata, content_encoding, decoding
+from onekey_client.cli.cli import cli
+from onekey_client.queries import load_query
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark"  # noqa: S105 (hardcoded password)
+TENANT = "Benchmark"
+DEFAULT_FINDINGS = (10, 10_000, 100_000)
+CHUNK_SIZE = 64 * 1024
+LATEST_RESULTS_PATH = ("firmware", "cveMatches")
+# distinct from the exit codes of errors, see _run_ci_result
+NEW_FINDINGS_EXIT_CODE = 3
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607 (partial executable path)
+            cwd=Path(__file__).parent,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(samples: list[float], unit: str, *, higher_is_better=False) -> dict:
+    ordered = sorted(samples)
+    return {
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "median": statistics.median(ordered),
+        "min": ordered[0],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "samples": samples,
+    }
+
+
+def _timed(func, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _peak_memory(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def _logged_in_client(url: str) -> Client:
+    client = Client(url)
+    client.login(EMAIL, PASSWORD)
+    client.use_tenant(client.get_tenant(TENANT))
+    return client
+
+
+def bench_cli_startup(repeat: int) -> dict:
+    def run():
+        subprocess.run(  # noqa: S603 (subprocess call)
+            [sys.executable, "-m", "onekey_client.cli.cli", "--help"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    return _summary(_timed(run, repeat), "s")
+
+
+def bench_client_startup(url: str, repeat: int) -> dict:
+    return _summary(_timed(lambda: Client(url), repeat), "s")
+
+
+def bench_login(url: str, repeat: int) -> dict:
+    client = Client(url)
+
+    def login():
+        client.login(EMAIL, PASSWORD)
+        client.use_tenant(client.get_tenant(TENANT))
+
+    return _summary(_timed(login, repeat), "s")
+
+
+def bench_query(url: str, repeat: int) -> dict:
+    client = _logged_in_client(url)
+    return _summary(_timed(client.get_product_groups, repeat), "s")
+
+
+def _write_firmware(path: Path, size_mb: int, *, compressible: bool):
+    with path.open("wb") as f:
+        for i in range(size_mb):
+            if compressible:
+                # about a quarter random, like a firmware with some packed parts
+                block = b"firmware block %d " % i
+                data = block * (768 * 1024 // len(block)) + os.urandom(256 * 1024)
+            else:
+                data = os.urandom(1024 * 1024)
+            f.write(data[: 1024 * 1024])
+
+
+def bench_upload(
+    url: str,
+    size_mb: int,
+    repeat: int,
+    *,
+    compression: str | None = None,
+    compressible: bool = False,
+) -> dict:
+    client = _logged_in_client(url)
+    metadata = FirmwareMetadata(
+        name="benchmark",
+        vendor_name="vendor",
+        product_name="product",
+        product_group_id=PRODUCT_GROUP_ID,
+        analysis_configuration_id=ANALYSIS_CONFIGURATION_ID,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "firmware.bin"
+        _write_firmware(path, size_mb, compressible=compressible)
+
+        samples = _timed(
+            lambda: client.upload_firmware(
+                metadata, path, enable_monitoring=False, compression=compression
+            ),
+            repeat,
+        )
+    return _summary([size_mb / s for s in samples], "MB/s", higher_is_better=True)
+
+
+def _run_ci_result(url: str, junit_path: Path | None):
+    args = [
+        "--api-url",
+        url,
+        "--email",
+        EMAIL,
+        "--password",
+        PASSWORD,
+        "--tenant",
+        TENANT,
+        "ci-result",
+        "--firmware-id",
+        FIRMWARE_ID,
+        "--check-interval",
+        "0",
+        "--exit-code-on-new-finding",
+        str(NEW_FINDINGS_EXIT_CODE),
+    ]
+    if junit_path is not None:
+        args += ["--junit-path", str(junit_path)]
+    output = io.StringIO()
+    exit_code = 0
+    with contextlib.redirect_stdout(output):
+        try:
+            cli.main(args, standalone_mode=False)
+        except SystemExit as e:
+            exit_code = e.code
+    # a failing run would be timed as a fast one
+    if exit_code not in (0, NEW_FINDINGS_EXIT_CODE):
+        error = f"ci-result failed with exit code {exit_code}:\n{output.getvalue()}"
+        raise click.ClickException(error)
+
+
+def bench_ci_result(url: str, repeat: int, *, junit: bool) -> tuple[dict, dict]:
+    """Time ci-result, with junit all finding details are fetched, else only counts."""
+    with tempfile.TemporaryDirectory() as tmp:
+        junit_path = Path(tmp) / "junit.xml" if junit else None
+        samples = _timed(lambda: _run_ci_result(url, junit_path), repeat)
+
+        peak = _peak_memory(lambda: _run_ci_result(url, junit_path))
+
+    return _summary(samples, "s"), _summary([peak], "MiB")
+
+
+def bench_decode(url: str, repeat: int) -> dict[str, dict]:
+    """Decode the latest results with the standard library, `decoding.loads` and streaming."""
+    client = _logged_in_client(url)
+    query = load_query("get_firmware_latest_results.graphql")
+    variables = {"id": FIRMWARE_ID}
+    raw = httpx.post(
+        f"{url}/graphql",
+        headers=client.get_auth_headers(),
+        json={"query": query, "variables": variables},
+    ).content
+    chunks = [raw[i : i + CHUNK_SIZE] for i in range(0, len(raw), CHUNK_SIZE)]
+
+    def stream():
+        for _ in decoding.iter_items(chunks, ("data", *LATEST_RESULTS_PATH)):
+            pass
+
+    def query_stream():
+        for _ in client.query_stream(query, LATEST_RESULTS_PATH, variables):
+            pass
+
+    return {
+        "decode_stdlib": _summary(_timed(lambda: json.loads(raw), repeat), "s"),
+        "decode": _summary(_timed(lambda: decoding.loads(raw), repeat), "s"),
+        "decode_stream": _summary(_timed(stream, repeat), "s"),
+        "query_peak_memory": _summary(
+            [_peak_memory(lambda: client.query(query, variables))], "MiB"
+        ),
+        "query_stream_peak_memory": _summary([_peak_memory(query_stream)], "MiB"),
+    }
+
+
+@click.group()
+def main():
+    """Benchmark the ONEKEY client against a local mock platform."""
+
+
+@main.command()
+@click.option(
+    "--output", type=click.Path(path_type=Path), help="Write results to this JSON file"
+)
+@click.option(
+    "--repeat", type=int, default=5, show_default=True, help="Samples per benchmark"
+)
+@click.option(
+    "--latency",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Mock server latency in seconds",
+)
+@click.option(
+    "--upload-size", type=int, default=64, show_default=True, help="Upload size in MiB"
+)
+@click.option(
+    "--upload-bandwidth",
+    type=float,
+    default=20.0,
+    show_default=True,
+    help="Mock server bandwidth in MiB/s for the compressed upload benchmarks",
+)
+@click.option(
+    "--findings",
+    type=int,
+    multiple=True,
+    default=DEFAULT_FINDINGS,
+    show_default=True,
+    help="Finding counts for the ci-result benchmark",
+)
+@click.option(
+    "--description-size",
+    type=int,
+    default=200,
+    show_default=True,
+    help="CVE description size in bytes",
+)
+def run(
+    output,
+    repeat,
+    latency,
+    upload_size,
+    upload_bandwidth,
+    findings,
+    description_size,
+):
+    """Run the benchmarks."""
+    results = {}
+
+    def record(name, summary):
+        results[name] = summary
+        click.echo(f"{name:<32} {summary['median']:>12.4f} {summary['unit']}")
+
+    record("cli_startup", bench_cli_startup(repeat))
+
+    with MockServer(MockConfig(latency=latency)) as server:
+        record("client_startup", bench_client_startup(server.url, repeat))
+        record("login", bench_login(server.url, repeat))
+        record("query", bench_query(server.url, repeat * 10))
+        record("upload_firmware", bench_upload(server.url, upload_size, repeat))
+
+    with MockServer(
+        MockConfig(latency=latency, upload_bandwidth=upload_bandwidth)
+    ) as server:
+        for compression in (None, *content_encoding.available_encodings()):
+            record(
+                f"upload_compressible[{compression or 'identity'}]",
+                bench_upload(
+                    server.url,
+                    upload_size,
+                    repeat,
+                    compression=compression,
+                    compressible=True,
+                ),
+            )
+
+    for count in findings:
+        config = MockConfig(
+            latency=latency, findings=count, description_size=description_size
+        )
+        with MockServer(config) as server:
+            duration, memory = bench_ci_result(server.url, repeat, junit=True)
+            counts_duration, counts_memory = bench_ci_result(
+                server.url, repeat, junit=False
+            )
+            decode = bench_decode(server.url, repeat)
+        record(f"ci_result[{count}]", duration)
+        record(f"ci_result_peak_memory[{count}]", memory)
+        record(f"ci_result_counts[{count}]", counts_duration)
+        record(f"ci_result_counts_peak_memory[{count}]", counts_memory)
+        for name, summary in decode.items():
+            record(f"{name}[{count}]", summary)
+
+    if output is not None:
+        report = {
+            "meta": {
+                "revision": _git_revision(),
+                "date": dt.datetime.now(dt.timezone.utc).isoformat(),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "parameters": {
+                    "repeat": repeat,
+                    "latency": latency,
+                    "upload_size": upload_size,
+                    "upload_bandwidth": upload_bandwidth,
+                    "findings": list(findings),
+                    "description_size": description_size,
+                },
+            },
+            "results": results,
+        }
+        output.write_text(json.dumps(report, indent=2))
+
+
+@main.command()
+@click.argument("baseline", type=click.Path(exists=True, path_type=Path))
+@click.argument("current", type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="Relative change reported as regression",
+)
+def compare(baseline, current, threshold):
+    """Compare two benchmark result files, exit 1 on regression."""
+    base = json.loads(baseline.read_text())
+    curr = json.loads(current.read_text())
+    if base["meta"]["parameters"] != curr["meta"]["parameters"]:
+        click.echo(
+            "Warning: benchmark parameters differ, results may not be comparable"
+        )
+
+    regressed = False
+    click.echo(f"{'benchmark':<32} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in curr["results"].items():
+        if name not in base["results"]:
+            continue
+        before, after = base["results"][name]["median"], result["median"]
+        change = (after - before) / before if before else 0.0
+        worse = -change if result["higher_is_better"] else change
+        flag = ""
+        if worse > threshold:
+            flag = " REGRESSION"
+            regressed = True
+        click.echo(f"{name:<32} {before:>12.4f} {after:>12.4f} {change:>+8.1%}{flag}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
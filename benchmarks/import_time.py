@@ -0,0 +1,101 @@
+"""Guard the imports of the CLI.
+
+Runs CLI invocations that must not log in under ``python -X importtime`` and
+fails if one of them imports a heavy dependency or the module of another
+subcommand. The import time is reported, but not checked, as it depends on the
+machine::
+
+    python benchmarks/import_time.py
+"""
+
+import importlib
+import subprocess
+import sys
+
+import click
+
+from onekey_client.cli.cli import SUBCOMMANDS
+
+HEAVY_MODULES = ("httpx", "authlib", "pydantic", "junit_xml")
+# modules of the cli package every invocation needs
+CLI_MODULES = {"onekey_client.cli.cli", "onekey_client.cli.auth"}
+# invocation and the subcommand modules it may import
+COMMANDS = (
+    (("--help",), set()),
+    (("ci-result", "--help"), {"onekey_client.cli.ci"}),
+    (("upload-firmware", "--help"), {"onekey_client.cli.firmware_upload"}),
+    (("list-tenants", "--help"), {"onekey_client.cli.misc"}),
+    (("get-tenant-token", "--help"), {"onekey_client.cli.misc"}),
+)
+
+
+def import_times(args: tuple[str, ...]) -> dict[str, int]:
+    """Return the cumulative import time in microseconds of top-level imports."""
+    proc = subprocess.run(  # noqa: S603 (subprocess call)
+        [sys.executable, "-X", "importtime", "-m", "onekey_client.cli.cli", *args],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        # nested imports are indented, their time is included in the parent's
+        if module.startswith("  "):
+            times.setdefault(module.strip(), 0)
+        else:
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+def subcommand_help_mismatches() -> list[str]:
+    """Return the subcommands whose help differs from the one listed by `onekey --help`."""
+    mismatches = []
+    for name, (module_name, attribute, short_help) in SUBCOMMANDS.items():
+        module = importlib.import_module(f"onekey_client.cli.{module_name}")
+        command = getattr(module, attribute)
+        if (command.help or "").splitlines()[0] != short_help:
+            mismatches.append(name)
+    return mismatches
+
+
+@click.command()
+def main():
+    """Check that the CLI imports stay light for commands not needing the client."""
+    failed = False
+    for args, allowed in COMMANDS:
+        times = import_times(args)
+        heavy = sorted({module.split(".")[0] for module in times} & set(HEAVY_MODULES))
+        subcommands = sorted(
+            module
+            for module in times
+            if module.startswith("onekey_client.cli.")
+            and module not in CLI_MODULES | allowed
+        )
+        total_ms = sum(
+            cumulative / 1000
+            for module, cumulative in times.items()
+            if module.startswith(("onekey_client", "click"))
+        )
+        ok = not heavy and not subcommands
+        failed |= not ok
+        click.echo(
+            f"{'OK  ' if ok else 'FAIL'} onekey {' '.join(args):<28} {total_ms:>8.1f} ms"
+            + (f" heavy imports: {', '.join(heavy)}" if heavy else "")
+            + (f" subcommand imports: {', '.join(subcommands)}" if subcommands else "")
+        )
+
+    mismatches = subcommand_help_mismatches()
+    if mismatches:
+        failed = True
+        click.echo(
+            f"FAIL help in SUBCOMMANDS differs from the command: {', '.join(mismatches)}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,783 @@
+"""Local stand-in for the ONEKEY platform API used by the benchmarks.
+
+It implements just enough of the platform for the SDK and the CLI to run
+end-to-end: the public key endpoints, ``/authorize``, ``/token``, ``/graphql``
+the firmware upload URL and GraphQL subscriptions over WebSocket
+(``graphql-transport-ws``) on ``/graphql``. Latency, payload sizes and finding counts are
+configurable so that the client side can be measured in isolation.
+
+Run it standalone with ``python benchmarks/mock_server.py --help``.
+"""
+
+import base64
+import hashlib
+import json
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import asdict, dataclass
+from functools import cached_property
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+from authlib.jose import JsonWebKey, jwt
+
+TOKEN_NAMESPACE = "https://www.onekey.com/"  # noqa: S105 (hardcoded credential)
+CLIENT_ID = "ONEKEY Python SDK"
+TOKEN_LIFETIME = 3600
+
+TENANT_ID = "00000000-0000-4000-8000-000000000001"
+PRODUCT_GROUP_ID = "00000000-0000-4000-8000-000000000002"
+ANALYSIS_CONFIGURATION_ID = "00000000-0000-4000-8000-000000000003"
+FIRMWARE_ID = "00000000-0000-4000-8000-000000000010"
+PREVIOUS_FIRMWARE_ID = "00000000-0000-4000-8000-000000000011"
+
+_OPERATION_RE = re.compile(r"^\s*(?:query|mutation|subscription)\s+(\w+)")
+_ROOT_FIELD_RE = re.compile(r"{\s*(\w+)")
+_SEVERITY_FILTER_RE = re.compile(r"severity:\s*\[([\w\s,]*)\]")
+_COUNT_FIELDS = ("id", "severity", "type")
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_WEBSOCKET_SUBPROTOCOL = "graphql-transport-ws"
+
+
+def _counted(finding: dict) -> dict:
+    return {field: finding[field] for field in _COUNT_FIELDS if field in finding}
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.0
+    """Seconds to wait before answering any request."""
+    findings: int = 10
+    """Number of issues and CVE entries returned by the result queries."""
+    description_size: int = 200
+    """Size of each CVE description in bytes."""
+    pending_polls: int = 0
+    """Number of analysis state polls answered with a running analysis."""
+    unavailable_queries: int = 0
+    """Number of state and timeline queries of a firmware answered with null, like right after its upload."""
+    result_filters: bool = True
+    """Whether the latest results query accepts severity and issue type filters."""
+    has_previous: bool = True
+    """Whether the firmware timeline contains a previous firmware."""
+    tenants: int = 1
+    """Number of tenants in the ID token."""
+    products: int = 3
+    """Number of products listed for the tenant-wide export."""
+    timeline: int = 6
+    """Number of firmwares in the product timeline, including the current one."""
+    subscriptions: bool = True
+    """Whether GraphQL subscriptions over WebSocket are accepted."""
+    subscription_delay: float = 1.0
+    """Seconds until a subscribed analysis finishes."""
+    upload_encodings: tuple[str, ...] = ("gzip", "zstd")
+    """Content encodings of compressed uploads that are accepted."""
+    advertise_encodings: bool = True
+    """Whether OPTIONS on the upload URL lists the accepted encodings."""
+    refused_encoding_status: int = 415
+    """Status of uploads with an unsupported encoding, e.g. 400 like some object stores."""
+    upload_bandwidth: float = 0.0
+    """Upload bandwidth in MiB/s, to simulate constrained uplinks, 0 for unlimited."""
+
+
+class MockPlatform:
+    """State shared by all request handlers of a running mock server."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self._key = JsonWebKey.generate_key("RSA", 2048, is_private=True)
+        self.public_key_pem = self._key.as_pem(is_private=False)
+        self._lock = threading.Lock()
+        self._polls: dict[str, int] = {}
+        self._queries: dict[str, int] = {}
+        self.uploaded_bytes = 0
+        """Size of the uploaded request bodies, after decompression."""
+        self.received_bytes = 0
+        """Size of the uploaded request bodies as sent."""
+
+    def sign(self, claims: dict) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": TOKEN_NAMESPACE,
+            "aud": CLIENT_ID,
+            "iat": now,
+            "exp": now + TOKEN_LIFETIME,
+            **claims,
+        }
+        return jwt.encode({"alg": "RS256"}, claims, self._key).decode()
+
+    @cached_property
+    def tenants(self) -> list[dict]:
+        return [
+            {
+                "id": TENANT_ID
+                if i == 0
+                else str(uuid.UUID(int=0x1000 + i, version=4)),
+                "name": "Benchmark" if i == 0 else f"Benchmark {i}",
+            }
+            for i in range(self.config.tenants)
+        ]
+
+    def analysis_state(self, firmware_id: str) -> str:
+        with self._lock:
+            polls = self._polls.get(firmware_id, 0)
+            self._polls[firmware_id] = polls + 1
+        return "RUNNING" if polls < self.config.pending_polls else "DONE"
+
+    def firmware_available(self, firmware_id: str) -> bool:
+        with self._lock:
+            queries = self._queries.get(firmware_id, 0)
+            self._queries[firmware_id] = queries + 1
+        return queries >= self.config.unavailable_queries
+
+    def finish_analysis(self, firmware_id: str):
+        with self._lock:
+            self._polls[firmware_id] = self.config.pending_polls
+
+    @cached_property
+    def issues(self) -> list[dict]:
+        return [
+            {
+                "__typename": "Issue",
+                "id": str(uuid.UUID(int=i, version=4)),
+                "severity": ("LOW", "MEDIUM", "HIGH", "CRITICAL")[i % 4],
+                "type": ("HARDCODED_PASSWORD", "CRYPTO_KEY", "UNSAFE_FUNCTION")[i % 3],
+                "file": {"path": f"/usr/lib/lib{i % 997}.so.{i}"},
+            }
+            for i in range(self.config.findings)
+        ]
+
+    @cached_property
+    def cves(self) -> list[dict]:
+        filler = "x" * self.config.description_size
+        return [
+            {
+                "id": f"CVE-{2000 + i % 25}-{i:05d}",
+                "description": filler,
+                "severity": ("LOW", "MEDIUM", "HIGH", "CRITICAL")[i % 4],
+            }
+            for i in range(self.config.findings)
+        ]
+
+    @cached_property
+    def latest_results(self) -> bytes:
+        data = {
+            "firmware": {
+                "latestIssues": self.issues,
+                "cveMatches": [
+                    {
+                        "component": {"name": f"component{i % 101}", "version": "1.0"},
+                        "cve": cve,
+                    }
+                    for i, cve in enumerate(self.cves)
+                ],
+            }
+        }
+        return json.dumps({"data": data}).encode()
+
+    @cached_property
+    def comparison(self) -> bytes:
+        data = {
+            "compareFirmwareAnalyses": {
+                "issues": {"new": self.issues, "dropped": self.issues[:1]},
+                "cveEntries": {
+                    "new": self.cves,
+                    "dropped": [_counted(cve) for cve in self.cves[:1]],
+                },
+            }
+        }
+        return json.dumps({"data": data}).encode()
+
+    @cached_property
+    def comparison_counts(self) -> bytes:
+        data = json.loads(self.comparison)["data"]
+        for findings in (
+            *data["compareFirmwareAnalyses"]["issues"].values(),
+            *data["compareFirmwareAnalyses"]["cveEntries"].values(),
+        ):
+            findings[:] = [_counted(finding) for finding in findings]
+        return json.dumps({"data": data}).encode()
+
+    def _trimmed_latest_results(self, query: str) -> bytes:
+        """Latest results filtered by severity, without details unless queried."""
+        match = _SEVERITY_FILTER_RE.search(query)
+        severities = set(match.group(1).replace(",", " ").split()) if match else None
+        details = "description" in query
+
+        def selected(findings):
+            return [
+                finding if details else _counted(finding)
+                for finding in findings
+                if severities is None or finding["severity"] in severities
+            ]
+
+        cve_matches = [
+            {"component": {"name": "component", "version": "1.0"}, "cve": cve}
+            if details
+            else {"cve": cve}
+            for cve in selected(self.cves)
+        ]
+        data = {
+            "firmware": {
+                "latestIssues": selected(self.issues),
+                "cveMatches": cve_matches,
+            }
+        }
+        return json.dumps({"data": data}).encode()
+
+    def graphql(self, base_url: str, payload: dict) -> bytes:
+        query = payload["query"]
+        variables = payload.get("variables") or {}
+        match = _OPERATION_RE.match(query) or _ROOT_FIELD_RE.search(query)
+        operation = match.group(1) if match else ""
+
+        if operation == "CompareFirmware":
+            return self.comparison if "description" in query else self.comparison_counts
+        if operation == "GetFimrwareLatestResult":
+            if not self.config.result_filters and _SEVERITY_FILTER_RE.search(query):
+                error = {"message": 'Unknown argument "severity"'}
+                return json.dumps({"errors": [error], "data": None}).encode()
+            if "description" in query and not _SEVERITY_FILTER_RE.search(query):
+                return self.latest_results
+            return self._trimmed_latest_results(query)
+        if operation in (
+            "GetFirmwareLatestAnalysisState",
+            "GetSameProductFirmwares",
+        ) and not self.firmware_available(variables["id"]):
+            return json.dumps({"data": {"firmware": None}}).encode()
+
+        return json.dumps(
+            {"data": self._small_query(base_url, operation, variables)}
+        ).encode()
+
+    def _small_query(self, base_url: str, operation: str, variables: dict):
+        if operation == "tenant":
+            return {
+                "tenant": {"name": "Benchmark"},
+                "user": {"email": "bench@example.com"},
+            }
+        if operation == "allProductGroups":
+            return {"allProductGroups": [{"id": PRODUCT_GROUP_ID, "name": "Default"}]}
+        if operation == "allAnalysisConfigurations":
+            return {
+                "allAnalysisConfigurations": [
+                    {"id": ANALYSIS_CONFIGURATION_ID, "name": "Default"}
+                ]
+            }
+        if operation == "CreateFirmwareUpload":
+            firmware_id = str(uuid.uuid4())
+            return {
+                "createFirmwareUpload": {
+                    "id": firmware_id,
+                    "uploadUrl": f"{base_url}/upload/{firmware_id}",
+                }
+            }
+        if operation == "GetFirmwareLatestAnalysisState":
+            firmware_id = variables["id"]
+            state = self.analysis_state(firmware_id)
+            return {
+                "firmware": {
+                    "name": "benchmark",
+                    "latestAnalysis": {
+                        "state": state,
+                        "result": "COMPLETE" if state == "DONE" else None,
+                    },
+                }
+            }
+        if operation == "GetLatestFirmwares":
+            return {"allProductGroups": [self._product_group()]}
+        if operation == "GetSameProductFirmwares":
+            ids = [variables["id"]]
+            if self.config.has_previous:
+                ids.append(PREVIOUS_FIRMWARE_ID)
+            timeline = [{"firmware": {"id": firmware_id}} for firmware_id in ids]
+            return {
+                "firmware": {
+                    "product": {
+                        "firmwareTimeline": timeline[: variables["firmwareCount"]]
+                    }
+                }
+            }
+        if operation == "GetProductFirmwareTimeline":
+            return {
+                "firmware": {
+                    "product": {
+                        "firmwareTimeline": self._timeline(variables["id"])[
+                            : variables["firmwareCount"]
+                        ]
+                    }
+                }
+            }
+        return {}
+
+    def _timeline(self, firmware_id: str) -> list[dict]:
+        """Firmware and its predecessors, newest first."""
+        count = self.config.timeline if self.config.has_previous else 1
+        ids = [firmware_id, PREVIOUS_FIRMWARE_ID] + [
+            str(uuid.UUID(int=0x3000 + i, version=4)) for i in range(2, count)
+        ]
+        return [
+            {
+                "firmware": {
+                    "id": ids[i],
+                    "name": "benchmark",
+                    "version": f"1.{count - 1 - i}",
+                }
+            }
+            for i in range(count)
+        ]
+
+    def _product_group(self) -> dict:
+        products = [
+            {
+                "name": f"Product {i}",
+                "vendor": {"name": f"Vendor {i % 7}"},
+                "firmwareTimeline": [
+                    {
+                        "firmware": {
+                            "id": FIRMWARE_ID
+                            if i == 0
+                            else str(uuid.UUID(int=0x2000 + i, version=4)),
+                            "name": f"firmware-{i}",
+                            "version": f"1.{i}",
+                        }
+                    }
+                ],
+            }
+            for i in range(self.config.products)
+        ]
+        return {"id": PRODUCT_GROUP_ID, "name": "Default", "products": products}
+
+
+def _decompressor(encoding: str):
+    """Streaming decompressor of a content encoding, None if not supported."""
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # noqa: A002 (shadowing builtin)
+        pass
+
+    @property
+    def platform(self) -> MockPlatform:
+        return self.server.platform
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _iter_body(self):
+        """Read the request body in chunks, with or without chunked transfer encoding."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                yield self.rfile.read(size)
+                self.rfile.readline()
+            # trailer section
+            while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def _send(
+        self,
+        body: bytes,
+        status: int = 200,
+        content_type: str = "application/json",
+        headers: dict[str, str] | None = None,
+    ):
+        time.sleep(self.platform.config.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(
+        self, data, status: int = 200, headers: dict[str, str] | None = None
+    ):
+        self._send(json.dumps(data).encode(), status, headers=headers)
+
+    def do_GET(self):
+        if self.path == "/api/graphql" and (
+            self.headers.get("Upgrade", "").lower() == "websocket"
+        ):
+            self._websocket()
+        elif self.path in (
+            "/api/id-token-public-key.pem",
+            "/api/tenant-token-public-key.pem",
+        ):
+            self._send(
+                self.platform.public_key_pem, content_type="application/x-pem-file"
+            )
+        else:
+            self._send_json({"detail": "Not Found"}, 404)
+
+    def do_POST(self):
+        if self.path.startswith("/api/upload/"):
+            self._upload()
+            return
+
+        payload = json.loads(self._read_body())
+        if self.path == "/api/authorize":
+            id_token = self.platform.sign(
+                {
+                    "sub": payload["email"],
+                    "nonce": payload["nonce"],
+                    TOKEN_NAMESPACE + "tenants": self.platform.tenants,
+                }
+            )
+            self._send_json({"id_token": id_token})
+        elif self.path == "/api/token":
+            claims = jwt.decode(payload["id_token"], self.platform.public_key_pem)
+            tenant_token = self.platform.sign(
+                {
+                    "sub": claims["sub"],
+                    "nonce": payload["nonce"],
+                    "tenant_id": payload["tenant_id"],
+                }
+            )
+            self._send_json({"tenant_token": tenant_token})
+        elif self.path == "/api/graphql":
+            self._send(self.platform.graphql(self.base_url, payload))
+        else:
+            self._send_json({"detail": "Not Found"}, 404)
+
+    @property
+    def _accept_encoding(self) -> dict[str, str]:
+        return {"Accept-Encoding": ", ".join(self.platform.config.upload_encodings)}
+
+    def do_OPTIONS(self):
+        if self.path.startswith("/api/upload/"):
+            headers = (
+                self._accept_encoding
+                if self.platform.config.advertise_encodings
+                else None
+            )
+            self._send(b"", 204, headers=headers)
+        else:
+            self._send_json({"detail": "Not Found"}, 404)
+
+    def _upload(self):
+        encoding = self.headers.get("Content-Encoding")
+        decompressor = None
+        if encoding is not None:
+            if encoding in self.platform.config.upload_encodings:
+                decompressor = _decompressor(encoding)
+            if decompressor is None:
+                for _ in self._iter_body():
+                    pass
+                self._send_json(
+                    {"detail": f"Unsupported content encoding: {encoding}"},
+                    self.platform.config.refused_encoding_status,
+                    headers=self._accept_encoding,
+                )
+                return
+
+        bandwidth = self.platform.config.upload_bandwidth * 1024 * 1024
+        start = time.monotonic()
+        received = size = 0
+        for chunk in self._iter_body():
+            received += len(chunk)
+            size += len(
+                chunk if decompressor is None else decompressor.decompress(chunk)
+            )
+            if bandwidth:
+                time.sleep(max(0.0, received / bandwidth - (time.monotonic() - start)))
+        self.platform.received_bytes += received
+        self.platform.uploaded_bytes += size
+        # sizes are not part of the platform response, they show the compression
+        self._send_json(
+            {"id": self.path.rsplit("/", 1)[-1], "size": size, "received": received}
+        )
+
+    def _websocket(self):
+        time.sleep(self.platform.config.latency)
+        protocols = self.headers.get("Sec-WebSocket-Protocol", "")
+        if not self.platform.config.subscriptions or _WEBSOCKET_SUBPROTOCOL not in [
+            protocol.strip() for protocol in protocols.split(",")
+        ]:
+            self._send_json({"detail": "Not Found"}, 404)
+            return
+
+        key = self.headers["Sec-WebSocket-Key"] + _WEBSOCKET_GUID
+        accept = base64.b64encode(hashlib.sha1(key.encode()).digest()).decode()  # noqa: S324 (required by RFC 6455)
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.send_header("Sec-WebSocket-Protocol", _WEBSOCKET_SUBPROTOCOL)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        if self._ws_recv().get("type") != "connection_init":
+            return
+        self._ws_send({"type": "connection_ack"})
+        message = self._ws_recv()
+        if message.get("type") != "subscribe":
+            return
+        firmware_id = message["payload"]["variables"]["id"]
+        subscription_id = message["id"]
+
+        def event(state: str):
+            analysis = {
+                "state": state,
+                "result": "COMPLETE" if state == "DONE" else None,
+            }
+            self._ws_send(
+                {
+                    "id": subscription_id,
+                    "type": "next",
+                    "payload": {"data": {"firmwareLatestAnalysis": analysis}},
+                }
+            )
+
+        event("RUNNING")
+        time.sleep(self.platform.config.subscription_delay)
+        self.platform.finish_analysis(firmware_id)
+        event("DONE")
+        self._ws_send({"id": subscription_id, "type": "complete"})
+
+    def _ws_send(self, message: dict):
+        payload = json.dumps(message).encode()
+        # server frames are not masked, a 16 bit length covers the messages sent here
+        if len(payload) < 126:  # noqa: PLR2004 (7 bit payload length)
+            header = struct.pack("!BB", 0x81, len(payload))
+        else:
+            header = struct.pack("!BBH", 0x81, 126, len(payload))
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+    def _ws_recv(self) -> dict:
+        header = self.rfile.read(2)
+        if len(header) < 2:  # noqa: PLR2004 (frame header size)
+            return {}
+        length = header[1] & 0x7F
+        if length == 126:  # noqa: PLR2004 (16 bit payload length)
+            (length,) = struct.unpack("!H", self.rfile.read(2))
+        elif length == 127:  # noqa: PLR2004 (64 bit payload length)
+            (length,) = struct.unpack("!Q", self.rfile.read(8))
+        mask = self.rfile.read(4)
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(length)))
+        if header[0] & 0x0F != 0x1:
+            return {}
+        return json.loads(payload)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, platform: MockPlatform):
+        super().__init__(address, _Handler)
+        self.platform = platform
+
+
+class MockServerStartError(RuntimeError):
+    def __init__(self):
+        super().__init__("Mock server failed to start")
+
+
+class MockServer:
+    """Mock ONEKEY platform running in a child process.
+
+    The server runs in a separate interpreter so that its CPU usage does not
+    compete with the measured client for the GIL.
+    """
+
+    def __init__(self, config: MockConfig | None = None):
+        self.config = config or MockConfig()
+        self._process = None
+        self.url = None
+
+    def __enter__(self):
+        self._process = subprocess.Popen(  # noqa: S603 (subprocess call)
+            [
+                sys.executable,
+                __file__,
+                "--port",
+                "0",
+                "--config",
+                json.dumps(asdict(self.config)),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.url = self._process.stdout.readline().strip()
+        if not self.url:
+            self._process.wait()
+            raise MockServerStartError
+        return self
+
+    def __exit__(self, *exc_info):
+        self._process.terminate()
+        self._process.wait()
+
+
+def serve(config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+    server = _Server((host, port), MockPlatform(config))
+    host, port = server.server_address[:2]
+    click.echo(f"http://{host}:{port}/api", nl=True)
+    sys.stdout.flush()
+    server.serve_forever()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option(
+    "--port", type=int, default=8000, show_default=True, help="0 picks a free port"
+)
+@click.option(
+    "--latency",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Seconds added to every response",
+)
+@click.option(
+    "--findings",
+    type=int,
+    default=10,
+    show_default=True,
+    help="Issues and CVEs per firmware",
+)
+@click.option(
+    "--description-size",
+    type=int,
+    default=200,
+    show_default=True,
+    help="CVE description size in bytes",
+)
+@click.option(
+    "--pending-polls",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Analysis polls before DONE",
+)
+@click.option(
+    "--tenants", type=int, default=1, show_default=True, help="Number of tenants"
+)
+@click.option(
+    "--products",
+    type=int,
+    default=3,
+    show_default=True,
+    help="Products listed for export",
+)
+@click.option(
+    "--timeline",
+    type=int,
+    default=6,
+    show_default=True,
+    help="Firmwares in the product timeline",
+)
+@click.option(
+    "--subscription-delay",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds until a subscribed analysis finishes",
+)
+@click.option(
+    "--upload-encoding",
+    "upload_encodings",
+    multiple=True,
+    default=("gzip", "zstd"),
+    show_default=True,
+    help="Accepted content encoding of compressed uploads, can be repeated",
+)
+@click.option(
+    "--upload-bandwidth",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Upload bandwidth in MiB/s, 0 for unlimited",
+)
+@click.option(
+    "--no-advertise-encodings",
+    "advertise_encodings",
+    flag_value=False,
+    default=True,
+    help="Don't list the accepted encodings in OPTIONS responses of the upload URL",
+)
+@click.option(
+    "--no-subscriptions",
+    "subscriptions",
+    flag_value=False,
+    default=True,
+    help="Refuse GraphQL subscriptions",
+)
+@click.option(
+    "--config",
+    "config_json",
+    help="JSON encoded configuration, overrides other options",
+)
+def main(
+    host,
+    port,
+    latency,
+    findings,
+    description_size,
+    pending_polls,
+    tenants,
+    products,
+    timeline,
+    subscription_delay,
+    upload_encodings,
+    upload_bandwidth,
+    advertise_encodings,
+    subscriptions,
+    config_json,
+):
+    """Run a mock ONEKEY platform API."""
+    if config_json is not None:
+        config = MockConfig(**json.loads(config_json))
+    else:
+        config = MockConfig(
+            latency=latency,
+            findings=findings,
+            description_size=description_size,
+            pending_polls=pending_polls,
+            tenants=tenants,
+            products=products,
+            timeline=timeline,
+            subscriptions=subscriptions,
+            subscription_delay=subscription_delay,
+            upload_encodings=upload_encodings,
+            upload_bandwidth=upload_bandwidth,
+            advertise_encodings=advertise_encodings,
+        )
+    serve(config, host, port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,33 @@
-from .client import Client as Client
-from .models import FirmwareMetadata as FirmwareMetadata
-from .models import Tenant as Tenant
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .client import Client as Client
+    from .models import FirmwareMetadata as FirmwareMetadata
+    from .models import Tenant as Tenant
+    from .sessions import SessionPool as SessionPool
+
+# Importing the client pulls in httpx, authlib and pydantic, which dominates the
+# startup time of the CLI. The public names are resolved on first access instead.
+_LAZY_ATTRIBUTES = {
+    "Client": ".client",
+    "FirmwareMetadata": ".models",
+    "Tenant": ".models",
+    "SessionPool": ".sessions",
+}
+
+
+def __getattr__(name: str):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        error = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(error) from None
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_LAZY_ATTRIBUTES])
@@ -0,0 +1,268 @@
+"""Columnar analytics over the findings of many firmwares.
+
+Findings are stored as NumPy arrays of integer codes, one per column, with the
+distinct strings (CVE ids, severities, component names, ...) interned once per
+column. Filters and group-by counts are vectorized over these codes, so
+aggregations over the results of thousands of firmwares don't loop in Python.
+
+Tables are built from the rows of `onekey export` (CSV, JSON Lines or Parquet
+files) or from rows added one by one with `TableBuilder`. Requires numpy, it is
+part of the `analytics` extra.
+"""
+
+import array
+import csv
+import json
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+COLUMNS = (
+    "kind",
+    "product_group",
+    "vendor",
+    "product",
+    "firmware_id",
+    "id",
+    "type",
+    "severity",
+    "component_name",
+)
+KINDS = ("issue", "cve")
+SEVERITIES = ("NONE", "LOW", "MEDIUM", "HIGH", "CRITICAL")
+MISSING = -1
+"""Code of missing values, they are left out of counts."""
+
+# categories with a meaningful order, keep it in histograms
+_ORDERED_CATEGORIES = {"kind": KINDS, "severity": SEVERITIES}
+
+
+class Interner:
+    """Assigns consecutive integer codes to strings."""
+
+    def __init__(self, categories: Iterable[str] = ()):
+        self._codes: dict[str, int] = {}
+        self.categories: list[str] = []
+        for category in categories:
+            self.code(category)
+
+    def code(self, value: str | None) -> int:
+        if value is None or value == "":
+            return MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def lookup(self, value: str) -> int:
+        """Code of an existing value, MISSING if it was never interned."""
+        return self._codes.get(value, MISSING)
+
+
+class Categorical:
+    """A column of integer codes with the strings they stand for."""
+
+    def __init__(self, codes: np.ndarray, interner: Interner):
+        self.codes = codes
+        self.interner = interner
+
+    @property
+    def categories(self) -> list[str]:
+        return self.interner.categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def isin(self, values: Iterable[str]) -> np.ndarray:
+        codes = [self.interner.lookup(value) for value in values]
+        return np.isin(self.codes, [code for code in codes if code != MISSING])
+
+    def take(self, selector) -> "Categorical":
+        return Categorical(self.codes[selector], self.interner)
+
+
+class FindingsTable:
+    """Findings of many firmwares, one row per issue or CVE match."""
+
+    def __init__(self, columns: dict[str, Categorical]):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["kind"])
+
+    def __getitem__(self, column: str) -> Categorical:
+        return self.columns[column]
+
+    def mask(self, **criteria: str | Iterable[str]) -> np.ndarray:
+        """Boolean mask of the rows matching all criteria.
+
+        Each keyword is a column name with one value or a collection of
+        accepted values, e.g. `mask(kind="cve", severity=["HIGH", "CRITICAL"])`.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, values in criteria.items():
+            accepted = [values] if isinstance(values, str) else values
+            mask &= self.columns[column].isin(accepted)
+        return mask
+
+    def filter(
+        self, mask: np.ndarray | None = None, **criteria: str | Iterable[str]
+    ) -> "FindingsTable":
+        """Table of the rows selected by mask and matching the criteria of `mask()`."""
+        selector = self.mask(**criteria)
+        if mask is not None:
+            selector &= mask
+        return FindingsTable(
+            {name: column.take(selector) for name, column in self.columns.items()}
+        )
+
+    def _group_keys(self, columns: tuple[str, ...]) -> tuple[np.ndarray, list[int]]:
+        """Combine the codes of columns into one int64 key per row."""
+        sizes = [max(len(self.columns[column].categories), 1) for column in columns]
+        keys = np.zeros(len(self), dtype=np.int64)
+        valid = np.ones(len(self), dtype=bool)
+        for column, size in zip(columns, sizes, strict=True):
+            codes = self.columns[column].codes
+            valid &= codes != MISSING
+            keys = keys * size + codes
+        return keys[valid], sizes
+
+    def _decode_keys(
+        self, keys: np.ndarray, columns: tuple[str, ...], sizes: list[int]
+    ) -> list[tuple[str, ...]]:
+        codes = []
+        for size in reversed(sizes):
+            codes.append(keys % size)
+            keys = keys // size
+        categories = [self.columns[column].categories for column in columns]
+        return [
+            tuple(categories[i][code] for i, code in enumerate(row))
+            for row in zip(*reversed(codes), strict=True)
+        ]
+
+    def count_by(
+        self, *columns: str, distinct: str | None = None, top: int | None = None
+    ) -> list[tuple]:
+        """Count rows per distinct value of columns, most frequent first.
+
+        With distinct, the distinct values of that column are counted instead
+        of rows, e.g. `count_by("id", distinct="firmware_id")` gives the number
+        of affected firmwares of every CVE. Returns (value, ..., count) tuples.
+        """
+        if distinct is None:
+            keys, sizes = self._group_keys(columns)
+        else:
+            pair_keys, pair_sizes = self._group_keys((*columns, distinct))
+            # one row per group and distinct value, then drop the distinct value
+            keys = np.unique(pair_keys) // pair_sizes[-1]
+            sizes = pair_sizes[:-1]
+
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        order = np.argsort(-counts, kind="stable")[:top]
+        labels = self._decode_keys(unique_keys[order], columns, sizes)
+        return [
+            (*label, int(count))
+            for label, count in zip(labels, counts[order], strict=True)
+        ]
+
+    def crosstab(
+        self, rows: str, columns: str
+    ) -> tuple[list[str], list[str], np.ndarray]:
+        """Count rows per pair of values, e.g. a severity histogram per product.
+
+        Returns the row labels, the column labels and the matrix of counts.
+        Columns with an inherent order (severity, kind) keep it, all of their
+        values are present; other labels are sorted.
+        """
+        row_column, column_column = self.columns[rows], self.columns[columns]
+        n_rows, n_columns = len(row_column.categories), len(column_column.categories)
+        valid = (row_column.codes != MISSING) & (column_column.codes != MISSING)
+        keys = (
+            row_column.codes[valid].astype(np.int64) * n_columns
+            + column_column.codes[valid]
+        )
+        matrix = np.bincount(keys, minlength=n_rows * n_columns).reshape(
+            n_rows, n_columns
+        )
+
+        row_order = self._label_order(rows, matrix.sum(axis=1))
+        column_order = self._label_order(columns, matrix.sum(axis=0))
+        return (
+            [row_column.categories[i] for i in row_order],
+            [column_column.categories[i] for i in column_order],
+            matrix[np.ix_(row_order, column_order)],
+        )
+
+    def _label_order(self, column: str, totals: np.ndarray) -> list[int]:
+        if column in _ORDERED_CATEGORIES:
+            return list(range(len(totals)))
+        categories = self.columns[column].categories
+        present = [code for code in range(len(totals)) if totals[code]]
+        return sorted(present, key=categories.__getitem__)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "FindingsTable":
+        builder = TableBuilder()
+        builder.add_rows(rows)
+        return builder.build()
+
+    @classmethod
+    def read(cls, path: Path) -> "FindingsTable":
+        """Load a file written by `onekey export`, the format is taken from the suffix."""
+        suffix = path.suffix.lower()
+        if suffix == ".parquet":
+            return _read_parquet(path)
+        with path.open(newline="") as f:
+            if suffix in (".jsonl", ".ndjson"):
+                return cls.from_rows(json.loads(line) for line in f)
+            return cls.from_rows(csv.DictReader(f))
+
+
+class TableBuilder:
+    """Collects rows into compact code arrays, without keeping the row dicts."""
+
+    def __init__(self):
+        self._interners = {
+            column: Interner(_ORDERED_CATEGORIES.get(column, ())) for column in COLUMNS
+        }
+        self._codes = {column: array.array("i") for column in COLUMNS}
+
+    def add_row(self, row: dict):
+        for column in COLUMNS:
+            self._codes[column].append(self._interners[column].code(row.get(column)))
+
+    def add_rows(self, rows: Iterable[dict]):
+        for row in rows:
+            self.add_row(row)
+
+    def build(self) -> FindingsTable:
+        return FindingsTable(
+            {
+                column: Categorical(
+                    np.array(self._codes[column], dtype=np.int32),
+                    self._interners[column],
+                )
+                for column in COLUMNS
+            }
+        )
+
+
+def _read_parquet(path: Path) -> FindingsTable:
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=list(COLUMNS))
+    columns = {}
+    for column in COLUMNS:
+        encoded = table.column(column).combine_chunks().dictionary_encode()
+        interner = Interner(_ORDERED_CATEGORIES.get(column, ()))
+        # map the file's dictionary to the interned codes, plus one slot for nulls
+        mapping = np.array(
+            [interner.code(value) for value in encoded.dictionary.to_pylist()]
+            + [MISSING],
+            dtype=np.int32,
+        )
+        indices = encoded.indices.fill_null(len(mapping) - 1).to_numpy()
+        columns[column] = Categorical(mapping[indices], interner)
+    return FindingsTable(columns)
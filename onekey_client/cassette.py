@@ -0,0 +1,260 @@
+"""Record and replay the communication with the ONEKEY platform.
+
+A cassette is a gzip compressed JSON Lines file, the first line is a header and
+every following line is one request / response exchange. Secrets are never
+written to a cassette:
+
+- request headers (e.g. Authorization) are not stored at all,
+- passwords and tokens in request and response bodies are redacted, JWTs are
+  stored as their (unsigned) claims,
+- query strings of upload URLs are dropped,
+- uploaded file contents are not stored, only their size.
+
+On replay, tokens are re-issued with the recorded claims and signed with an
+ephemeral key which is also served as the token verification public key, so
+both email / password and API token logins work offline.
+"""
+
+import base64
+import binascii
+import collections
+import contextlib
+import gzip
+import hashlib
+import json
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Literal
+
+import httpx
+
+from . import errors
+
+CASSETTE_VERSION = 1
+REDACTED = "<redacted>"
+REDACTED_FIELDS = {"password", "id_token", "tenant_token"}
+TOKEN_FIELDS = {"id_token", "tenant_token"}
+VOLATILE_CLAIMS = {"sub", "nonce", "iat", "exp", "nbf", "auth_time", "jti"}
+REISSUED_TOKEN_LIFETIME = 3600
+
+ReplayLatency = Literal["original", "zero"]
+
+
+def _is_public_key(path: str) -> bool:
+    return path.endswith("-public-key.pem")
+
+
+def _decode_jwt_payload(raw_token: str) -> dict:
+    """Decode the claims of a JWT without verifying it."""
+    try:
+        payload = raw_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError, binascii.Error):
+        return {}
+
+
+def _jwt_claims(raw_token: str) -> dict:
+    """Claims of a JWT worth recording, the per-login ones are re-issued on replay."""
+    claims = _decode_jwt_payload(raw_token)
+    return {k: v for k, v in claims.items() if k not in VOLATILE_CLAIMS}
+
+
+def _redact(value, *, response: bool):
+    if isinstance(value, dict):
+        redacted = {}
+        for key, item in value.items():
+            if key in TOKEN_FIELDS and response and isinstance(item, str):
+                redacted[key] = {"jwt_claims": _jwt_claims(item)}
+            elif key in REDACTED_FIELDS:
+                redacted[key] = REDACTED
+            elif key == "uploadUrl" and isinstance(item, str):
+                redacted[key] = str(httpx.URL(item).copy_with(query=None))
+            else:
+                redacted[key] = _redact(item, response=response)
+        return redacted
+    if isinstance(value, list):
+        return [_redact(item, response=response) for item in value]
+    return value
+
+
+def _is_json(headers: httpx.Headers) -> bool:
+    return headers.get("content-type", "").startswith("application/json")
+
+
+def _request_key(method: str, path: str, body) -> str:
+    """Key used to match replayed requests with recorded exchanges.
+
+    GraphQL requests are matched on the query and variables, everything else on
+    the method and path only, as other bodies contain nonces.
+    """
+    key = f"{method} {path}"
+    if isinstance(body, dict) and "query" in body:
+        digest = hashlib.sha256(
+            json.dumps([body["query"], body.get("variables")], sort_keys=True).encode()
+        ).hexdigest()
+        key += f" {digest}"
+    return key
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Transport writing every exchange of the wrapped transport to a cassette."""
+
+    def __init__(self, path: Path, transport: httpx.BaseTransport):
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")  # noqa: SIM115 (closed in close())
+        self._write({"version": CASSETTE_VERSION})
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.monotonic()
+        response = self._transport.handle_request(request)
+        response.read()
+        elapsed = time.monotonic() - start
+
+        request_body = None
+        if _is_json(request.headers):
+            request_body = _redact(json.loads(request.read()), response=False)
+
+        if _is_public_key(request.url.path):
+            response_kind, response_body = "public_key", None
+        elif _is_json(response.headers):
+            response_kind = "json"
+            response_body = _redact(json.loads(response.content), response=True)
+        else:
+            response_kind = "base64"
+            response_body = base64.b64encode(response.content).decode()
+
+        self._write(
+            {
+                "method": request.method,
+                "path": request.url.path,
+                "request": request_body,
+                "request_size": int(request.headers.get("content-length", 0)),
+                "status": response.status_code,
+                "content_type": response.headers.get("content-type"),
+                "response_kind": response_kind,
+                "response": response_body,
+                "elapsed": round(elapsed, 6),
+            }
+        )
+        return response
+
+    def close(self):
+        self._transport.close()
+        with self._lock:
+            self._file.close()
+
+
+def load_cassette(path: Path) -> list[dict]:
+    """Load the exchanges of a cassette.
+
+    Cassettes of interrupted recordings lack the gzip end marker, everything
+    recorded until the interruption is returned. Files that are not a
+    cassette, or are empty or corrupt, raise `errors.InvalidCassette`.
+    """
+    lines = []
+    try:
+        with (
+            gzip.open(path, "rt", encoding="utf-8") as f,
+            contextlib.suppress(EOFError),
+        ):
+            lines.extend(f)
+        header, *entries = (json.loads(line) for line in lines if line.endswith("\n"))
+    except (gzip.BadGzipFile, zlib.error, ValueError) as e:
+        # ValueError covers an empty cassette and undecodable lines
+        raise errors.InvalidCassette from e
+    if not isinstance(header, dict) or header.get("version") != CASSETTE_VERSION:
+        raise errors.InvalidCassette
+    return entries
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Transport serving the responses recorded in a cassette.
+
+    Requests are answered in recorded order per request key, the last response
+    is repeated when a request is issued more often than recorded (e.g. more
+    analysis state polls).
+    """
+
+    def __init__(self, path: Path, *, latency: ReplayLatency = "original"):
+        self._latency = latency
+        self._lock = threading.Lock()
+        self._exchanges: dict[str, collections.deque] = collections.defaultdict(
+            collections.deque
+        )
+        for entry in load_cassette(path):
+            key = _request_key(entry["method"], entry["path"], entry["request"])
+            self._exchanges[key].append(entry)
+        self._signing_key = None
+
+    def _key(self):
+        if self._signing_key is None:
+            from authlib.jose import JsonWebKey
+
+            self._signing_key = JsonWebKey.generate_key("RSA", 2048, is_private=True)
+        return self._signing_key
+
+    def _next_exchange(self, key: str) -> dict:
+        with self._lock:
+            recorded = self._exchanges.get(key)
+            if not recorded:
+                raise errors.ReplayMismatch(key)
+            return recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if _is_public_key(path):
+            return httpx.Response(
+                200, content=self._key().as_pem(is_private=False), request=request
+            )
+
+        body = json.loads(request.read()) if _is_json(request.headers) else None
+        entry = self._next_exchange(_request_key(request.method, path, body))
+        if self._latency == "original":
+            time.sleep(entry["elapsed"])
+
+        headers = {}
+        if entry["content_type"] is not None:
+            headers["content-type"] = entry["content_type"]
+
+        if entry["response_kind"] == "json":
+            content = json.dumps(self._reissue_tokens(entry["response"], body)).encode()
+        else:
+            content = base64.b64decode(entry["response"])
+
+        return httpx.Response(
+            entry["status"], headers=headers, content=content, request=request
+        )
+
+    def _reissue_tokens(self, response, request_body):
+        """Sign recorded token claims for the current login request."""
+        if not isinstance(response, dict) or not TOKEN_FIELDS & response.keys():
+            return response
+
+        from authlib.jose import jwt
+
+        if "email" in request_body:
+            subject = request_body["email"]
+        else:
+            subject = _decode_jwt_payload(request_body["id_token"]).get("sub")
+
+        reissued = dict(response)
+        for field in TOKEN_FIELDS & response.keys():
+            now = int(time.time())
+            claims = {
+                **response[field]["jwt_claims"],
+                "sub": subject,
+                "nonce": request_body["nonce"],
+                "iat": now,
+                "exp": now + REISSUED_TOKEN_LIFETIME,
+            }
+            reissued[field] = jwt.encode({"alg": "RS256"}, claims, self._key()).decode()
+        return reissued
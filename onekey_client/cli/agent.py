@@ -0,0 +1,353 @@
+"""Long-running agent amortizing login and connection setup for CLI calls.
+
+`onekey agent` logs in once and serves subcommands over a Unix socket, the
+other CLI invocations forward their command to it when it is running with the
+same credentials and fall back to running in-process otherwise.
+
+The protocol is newline delimited JSON: the CLI sends one request with the
+command name, its parameters and a fingerprint of the credentials, the agent
+streams back the command output and finally its exit code.
+
+Only the user running the agent may talk to it: the socket is created in a
+directory others can't write to, the CLI connects only to a socket owned by
+the same user (and checks the peer where the platform supports it), and the
+fingerprint is keyed with a secret the agent writes next to the socket,
+readable by the user only.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import hmac
+import json
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import click
+
+from .auth import ClientFactory, pass_client
+
+if TYPE_CHECKING:
+    from onekey_client import Client
+
+FORWARDED_COMMANDS = frozenset(
+    {"upload-firmware", "ci-result", "list-tenants", "get-tenant-token", "export"}
+)
+
+
+def _to_json(value):
+    if isinstance(value, Path):
+        # the agent may run in another working directory
+        return str(value.resolve())
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, tuple | list):
+        return [_to_json(v) for v in value]
+    return value
+
+
+def _key_path(socket_path: Path) -> Path:
+    return socket_path.with_suffix(".key")
+
+
+def _read_key(path: Path) -> bytes | None:
+    """Read the secret of the agent, None if it is missing or not private to the user."""
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return None
+    with os.fdopen(fd, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_uid != os.getuid() or st.st_mode & 0o077:
+            return None
+        return f.read()
+
+
+def _write_key(path: Path) -> bytes:
+    key = secrets.token_bytes(32)
+    path.unlink(missing_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _private_directory(path: Path):
+    """Create the directory of the socket, refuse one others can write to."""
+    path.mkdir(mode=0o700, exist_ok=True)
+    st = path.stat()
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        error = f"{path} must be owned by the current user and not writable by others"
+        raise click.ClickException(error)
+
+
+def _peer_uid(sock: socket.socket) -> int | None:
+    """User id of the process at the other end of sock, None if the platform can't tell."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _pid, uid, _gid = struct.unpack("3i", creds)
+    return uid
+
+
+def _connect(path: Path) -> socket.socket | None:
+    """Connect to the agent socket, None if it is not served by the current user."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        if path.lstat().st_uid != os.getuid():
+            sock.close()
+            return None
+        sock.connect(str(path))
+        peer_uid = _peer_uid(sock)
+    except OSError:
+        sock.close()
+        return None
+    if peer_uid is not None and peer_uid != os.getuid():
+        sock.close()
+        return None
+    return sock
+
+
+def forward(factory: ClientFactory, ctx: click.Context) -> int | None:
+    """Run the command of ctx in the agent, return its exit code.
+
+    Returns None if no agent of the current user is running with the same
+    credentials, the command has to be run in-process then.
+    """
+    if ctx.info_name not in FORWARDED_COMMANDS:
+        return None
+
+    key = _read_key(_key_path(factory.agent_socket))
+    if key is None:
+        return None
+    sock = _connect(factory.agent_socket)
+    if sock is None:
+        return None
+
+    request = {
+        "command": ctx.info_name,
+        "params": {name: _to_json(value) for name, value in ctx.params.items()},
+        "identity": factory.identity(key),
+    }
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "output" in message:
+                click.echo(message["output"], nl=False, err=message["err"])
+            elif "exit_code" in message:
+                return message["exit_code"]
+            else:
+                return None
+    # the agent went away in the middle of the command
+    click.echo("Connection to the ONEKEY agent lost", err=True)
+    return 1
+
+
+class _ContextStream:
+    """Stand-in for sys.stdout / sys.stderr sending output of agent threads to their caller.
+
+    The redirect is held in a context variable, so worker threads of a command
+    that run in a copy of the handler's context send their output to the same
+    caller.
+    """
+
+    def __init__(self, stream, err: bool):
+        self._stream = stream
+        self._err = err
+        self._send = contextvars.ContextVar("send", default=None)
+
+    def redirect(self, send):
+        self._send.set(send)
+
+    def write(self, text: str):
+        send = self._send.get()
+        if send is None:
+            return self._stream.write(text)
+        send({"output": text, "err": self._err})
+        return len(text)
+
+    def flush(self):
+        if self._send.get() is None:
+            self._stream.flush()
+
+    def isatty(self):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _ttl_cache(func, ttl: float):
+    """Cache the result of a method without arguments for ttl seconds."""
+    lock = threading.Lock()
+    cached = {}
+
+    @functools.wraps(func)
+    def wrapper():
+        with lock:
+            if "value" not in cached or time.monotonic() - cached["time"] > ttl:
+                cached["value"] = func()
+                cached["time"] = time.monotonic()
+            return cached["value"]
+
+    return wrapper
+
+
+class _AgentServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(
+        self, path: Path, factory: ClientFactory, token_refresh: float, key: bytes
+    ):
+        self.factory = factory
+        self.key = key
+        self.token_refresh = token_refresh
+        self.stdout = _ContextStream(sys.stdout, err=False)
+        self.stderr = _ContextStream(sys.stderr, err=True)
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(str(path), _AgentHandler)
+        finally:
+            os.umask(old_umask)
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    server: _AgentServer
+
+    def setup(self):
+        super().setup()
+        # worker threads of the command send output concurrently
+        self._send_lock = threading.Lock()
+
+    def _send(self, message: dict):
+        with self._send_lock:
+            self.wfile.write(json.dumps(message).encode() + b"\n")
+            self.wfile.flush()
+
+    def handle(self):
+        from onekey_client.cli.cli import cli
+
+        request = json.loads(self.rfile.readline())
+        factory = self.server.factory
+        command = cli.get_command(click.Context(cli), request["command"])
+        if (
+            not hmac.compare_digest(
+                request["identity"], factory.identity(self.server.key)
+            )
+            or request["command"] not in FORWARDED_COMMANDS
+            or command is None
+        ):
+            self._send({"error": "rejected"})
+            return
+
+        self.server.stdout.redirect(self._send)
+        self.server.stderr.redirect(self._send)
+        try:
+            exit_code = self._run(command, request["params"])
+        finally:
+            self.server.stdout.redirect(None)
+            self.server.stderr.redirect(None)
+        self._send({"exit_code": exit_code})
+
+    def _run(self, command: click.Command, params: dict) -> int:
+        parent = click.Context(
+            click.Group(), obj=self.server.factory, info_name="onekey"
+        )
+        ctx = click.Context(command, parent=parent, info_name=command.name)
+        try:
+            with ctx:
+                self.server.factory.get_client().refresh_tenant_token(
+                    max_age=self.server.token_refresh
+                )
+                kwargs = {
+                    param.name: param.type_cast_value(ctx, params.get(param.name))
+                    for param in command.params
+                    if param.name is not None
+                }
+                ctx.invoke(command.callback, **kwargs)
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            return e.code if isinstance(e.code, int) else 1
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except Exception as e:
+            click.echo(f"Error: {e!s}", err=True)
+            return 1
+        return 0
+
+
+def _interrupt(_signum, _frame):
+    raise KeyboardInterrupt
+
+
+@click.command()
+@click.option(
+    "--cache-ttl",
+    type=float,
+    default=300,
+    show_default=True,
+    help="Seconds to cache product groups and analysis configurations",
+)
+@click.option(
+    "--token-refresh",
+    type=float,
+    default=300,
+    show_default=True,
+    help="Seconds after which the tenant token is refreshed",
+)
+@pass_client
+@click.pass_context
+def agent(ctx, client: Client, cache_ttl: float, token_refresh: float):
+    """Serve other CLI invocations with a logged in client."""
+    factory = ctx.find_object(ClientFactory)
+    factory.forwarding = False
+    client.get_product_groups = _ttl_cache(client.get_product_groups, cache_ttl)
+    client.get_analysis_configurations = _ttl_cache(
+        client.get_analysis_configurations, cache_ttl
+    )
+
+    path = factory.agent_socket
+    _private_directory(path.parent)
+    if path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+        else:
+            click.echo(f"An agent is already running on {path}")
+            sys.exit(1)
+        finally:
+            probe.close()
+
+    key_path = _key_path(path)
+    server = _AgentServer(path, factory, token_refresh, _write_key(key_path))
+    sys.stdout, sys.stderr = server.stdout, server.stderr
+    signal.signal(signal.SIGTERM, _interrupt)
+    click.echo(f"ONEKEY agent listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("ONEKEY agent stopped")
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+        key_path.unlink(missing_ok=True)
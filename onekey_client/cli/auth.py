@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import functools
+import hmac
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import click
+
+if TYPE_CHECKING:
+    from onekey_client import Client
+    from onekey_client.cassette import ReplayLatency
+
+
+class ClientFactory:
+    """Authentication options of the CLI, the Client is created on first use.
+
+    Creating a Client fetches the token verification keys and logs in, which is
+    not needed for `--help` or commands working on local files only.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        disable_tls_verify: bool,
+        email: str | None,
+        password: str | None,
+        tenant_name: str | None,
+        token: str | None,
+        *,
+        record_path: Path | None = None,
+        replay_path: Path | None = None,
+        replay_latency: ReplayLatency = "original",
+        agent_socket: Path | None = None,
+        use_agent: bool = True,
+    ):
+        self.api_url = api_url
+        self.disable_tls_verify = disable_tls_verify
+        self.email = email
+        self.password = password
+        self.tenant_name = tenant_name
+        self.token = token
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_latency = replay_latency
+        self.agent_socket = agent_socket or default_agent_socket()
+        # recorded or replayed sessions must not be served by the agent
+        self.forwarding = use_agent and record_path is None and replay_path is None
+        self._client = None
+
+    def identity(self, key: bytes) -> str:
+        """Fingerprint of the credentials, to check that the agent is logged in the same way.
+
+        key is the secret of the running agent, so the fingerprint reveals
+        nothing about the credentials to anyone not knowing it.
+        """
+        credentials = [
+            self.api_url,
+            self.disable_tls_verify,
+            self.email,
+            self.password,
+            self.tenant_name,
+            self.token,
+        ]
+        return hmac.new(key, json.dumps(credentials).encode(), "sha256").hexdigest()
+
+    def get_client(self) -> Client:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> Client:
+        self._check_credentials()
+
+        from onekey_client import Client, tracing
+        from onekey_client.cassette import ReplayTransport
+
+        transport = None
+        if self.replay_path is not None:
+            transport = ReplayTransport(self.replay_path, latency=self.replay_latency)
+
+        with tracing.span("create client", "cli"):
+            client = Client(
+                api_url=self.api_url,
+                disable_tls_verify=self.disable_tls_verify,
+                record_path=self.record_path,
+                transport=transport,
+            )
+            if self.token is not None:
+                login_with_token(client, self.token, self.api_url)
+            else:
+                login_with_email(
+                    client, self.email, self.password, self.tenant_name, self.api_url
+                )
+        return client
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    def _check_credentials(self):
+        if self.token is not None and (
+            self.email is not None
+            or self.password is not None
+            or self.tenant_name is not None
+        ):
+            click.echo(
+                "Invalid authentication details, either specify token or email/password/tenant, but not both!"
+            )
+            sys.exit(1)
+
+        if self.token is None and (
+            self.email is None or self.password is None or self.tenant_name is None
+        ):
+            click.echo(
+                "Invalid authentication details, specify email, password and tenant, if token is not specified!"
+            )
+            sys.exit(1)
+
+
+def default_agent_socket() -> Path:
+    """Socket in the user's runtime directory, or in a private directory in /tmp."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "onekey-agent.sock"
+    return Path(tempfile.gettempdir()) / f"onekey-agent-{os.getuid()}" / "agent.sock"
+
+
+def pass_client(f):
+    """Pass the authenticated Client as first argument, like `click.pass_obj`.
+
+    When a `onekey agent` with the same credentials is running, the command is
+    executed by the agent instead.
+    """
+
+    @click.pass_context
+    def new_func(ctx, *args, **kwargs):
+        factory = ctx.find_object(ClientFactory)
+        if factory.forwarding and factory.agent_socket.exists():
+            from .agent import forward
+
+            exit_code = forward(factory, ctx)
+            if exit_code is not None:
+                sys.exit(exit_code)
+
+        return ctx.invoke(f, factory.get_client(), *args, **kwargs)
+
+    return functools.update_wrapper(new_func, f)
+
+
+def login_with_email(client, email, password, tenant_name, api_url):
+    import httpx
+
+    try:
+        client.login(email, password)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == httpx.codes.UNAUTHORIZED:
+            click.echo(f"Authentication failed on {email} @ {api_url}")
+            sys.exit(1)
+        else:
+            click.echo(
+                f"Error connecting to ONEKEY platform: '{api_url}', error: {e.response.status_code}"
+            )
+            sys.exit(2)
+
+    try:
+        tenant = client.get_tenant(tenant_name)
+    except KeyError:
+        click.echo(f"Invalid tenant: {tenant_name}")
+        tenants = client.get_all_tenants()
+        click.echo("Available tenants:")
+        for tenant in tenants:
+            click.echo(f"- {tenant.name} ({tenant.id}")
+        sys.exit(3)
+
+    client.use_tenant(tenant)
+
+
+def login_with_token(client, token, api_url):
+    import httpx
+
+    try:
+        client.use_token(token)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == httpx.codes.UNAUTHORIZED:
+            click.echo(f"Authentication failed with token on {api_url}")
+            sys.exit(1)
+        else:
+            click.echo(
+                f"Error connecting to ONEKEY platform: '{api_url}', error: {e.response.status_code}"
+            )
+            sys.exit(2)
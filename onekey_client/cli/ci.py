@@ -1,19 +1,122 @@
+from __future__ import annotations
+
+import copy
+import datetime as dt
+import json
 import sys
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Literal
 from uuid import UUID
 
 import click
-import httpx
-from junit_xml import TestCase, TestSuite
 
-from onekey_client import Client
+from onekey_client import errors, tracing
 from onekey_client.queries import load_query
+from onekey_client.queries.results import (
+    ENUM_VALUE_RE,
+    SEVERITIES,
+    compare_firmware_query,
+    latest_results_query,
+)
+
+from .auth import pass_client
+
+if TYPE_CHECKING:
+    from onekey_client import Client
+
+WaitStrategy = Literal["poll", "subscribe"]
+
+DEFAULT_STATE_FILE = "onekey-ci-state.json"
+# EX_TEMPFAIL, the analysis has not finished yet, try again later
+PENDING_EXIT_CODE = 75
+
+
+class FindingFilter:
+    """Findings ci-result reports, and the fields fetched for them.
+
+    Without details only the fields needed to count the findings are queried.
+    The platform filters the latest results if it supports it, comparisons are
+    filtered here.
+    """
+
+    def __init__(
+        self,
+        min_severity: str | None = None,
+        issue_types: tuple[str, ...] = (),
+        *,
+        details: bool = True,
+    ):
+        self.severities = None
+        if min_severity is not None:
+            self.severities = SEVERITIES[SEVERITIES.index(min_severity) :]
+        self.issue_types = tuple(issue_types)
+        self.details = details
+        # cleared when the platform rejects the filter arguments
+        self.platform_filter = True
+
+    @property
+    def filtered(self) -> bool:
+        return self.severities is not None or bool(self.issue_types)
+
+    def latest_results_query(self) -> str:
+        return latest_results_query(
+            self.severities, self.issue_types, details=self.details
+        )
+
+    def query_latest_results(self, client: Client, firmware_id: str) -> dict:
+        """Query the filtered latest results of a firmware.
+
+        Falls back to an unfiltered query if the platform rejects the filter
+        arguments of `latest_results_query`, the findings are filtered here.
+        """
+        res = None
+        if self.platform_filter:
+            try:
+                res = client.query(self.latest_results_query(), {"id": firmware_id})
+            except errors.QueryError as e:
+                if not self.filtered:
+                    raise
+                click.echo(
+                    f"Filtering findings on the platform failed, filtering them locally; error='{e!s}'"
+                )
+                self.platform_filter = False
+        if res is None:
+            res = client.query(
+                latest_results_query(details=self.details), {"id": firmware_id}
+            )
 
-FIRMWARE_STATUS_QUERY = load_query("get_firmware_latest_analysis_state.graphql")
-GET_ALL_FIRMWARES = load_query("get_same_product_firmwares.graphql")
-COMPARE_FIRMWARE = load_query("compare_firmware.graphql")
-LATEST_ISSUES_QUERY = load_query("get_firmware_latest_results.graphql")
+        firmware = res["firmware"]
+        return {
+            **firmware,
+            "latestIssues": self.issues(firmware["latestIssues"]),
+            "cveMatches": [
+                cve_match
+                for cve_match in firmware["cveMatches"]
+                if self.cves([cve_match["cve"]])
+            ],
+        }
+
+    def compare_firmware_query(self) -> str:
+        return compare_firmware_query(details=self.details, filtered=self.filtered)
+
+    def with_details(self) -> FindingFilter:
+        finding_filter = copy.copy(self)
+        finding_filter.details = True
+        return finding_filter
+
+    def issues(self, issues: list[dict]) -> list[dict]:
+        return [
+            issue
+            for issue in issues
+            if (self.severities is None or issue["severity"] in self.severities)
+            and (not self.issue_types or issue["type"] in self.issue_types)
+        ]
+
+    def cves(self, cves: list[dict]) -> list[dict]:
+        if self.severities is None:
+            return cves
+        return [cve for cve in cves if cve["severity"] in self.severities]
 
 
 class ResultHandler:
@@ -24,25 +127,67 @@ class ResultHandler:
         retry_count=10,
         retry_wait=60,
         check_interval=60,
+        wait_strategy: WaitStrategy = "poll",
+        finding_filter: FindingFilter | None = None,
+        trend: int | None = None,
+        trend_report: Path | None = None,
     ):
         self.client = client
         self.firmware_id = str(firmware_id)
         self.retry_count = retry_count
         self.retry_wait = retry_wait
         self.check_interval = check_interval
+        self.wait_strategy = wait_strategy
+        self.finding_filter = finding_filter or FindingFilter()
+        self.trend = trend
+        self.trend_report = trend_report
 
     def get_result(self):
+        """Wait for the analysis to finish and compare it with the previous firmware."""
+        return self._retry(self._get_result)
+
+    def get_submitted_recent_firmware_id(self) -> tuple[str | None, bool]:
+        """Previous firmware to compare with, recorded when submitting without waiting.
+
+        Also returns whether it could be looked up: right after the upload the
+        firmware may not be available yet, it is looked up when collecting then.
+        """
+        res = self._retry(self._query_same_product_firmwares)
+        if res["firmware"] is None:
+            click.echo(
+                "Firmware is not yet available, the previous firmware is looked up when collecting."
+            )
+            return None, False
+        return self._recent_firmware_id(res), True
+
+    def get_collected_result(self, recent_id: str | None, *, resolved: bool = True):
+        """Compare the finished analysis with recent_id recorded on submit.
+
+        If it was not resolved on submit, the previous firmware is looked up now.
+        """
+        if self.trend is not None:
+            return self._retry(self._get_trend_result)
+        if not resolved:
+            return self._retry(
+                lambda: self._compare_results(self.get_recent_firmware_id())
+            )
+        return self._retry(self._compare_results, recent_id)
+
+    def _retry(self, func, *args):
+        import httpx
+
         error_count = 1
 
         while True:
             try:
-                return self._get_result()
+                return func(*args)
             except httpx.HTTPError as e:
                 if error_count <= self.retry_count:
                     click.echo(
                         f"Error communicating with ONEKEY platform, retrying; error='{e!s}'"
                     )
-                    time.sleep(self.retry_wait * error_count)
+                    with tracing.span("retry wait", "wait"):
+                        time.sleep(self.retry_wait * error_count)
                     error_count += 1
                 else:
                     click.echo(
@@ -52,36 +197,75 @@ class ResultHandler:
 
     def _get_result(self):
         self.wait_for_analysis_finish()
-
-        recent_id = self.get_recent_firmware_id()
+        if self.trend is not None:
+            return self._get_trend_result()
+        return self._compare_results(self.get_recent_firmware_id())
+
+    def _get_trend_result(self):
+        """Compare with the previous firmware, reporting the trend since trend firmwares."""
+        from .trend import TrendAnalyzer
+
+        # findings are matched across firmwares by their type and file
+        analyzer = TrendAnalyzer(self.client, self.finding_filter.with_details())
+        timeline = analyzer.get_timeline(self.firmware_id, self.trend)
+        if timeline is None or len(timeline) < 2:  # noqa: PLR2004 (one comparison)
+            click.echo("No firmware timeline to follow, comparing with previous")
+            return self._compare_results(self.get_recent_firmware_id())
+
+        with tracing.span("trend analysis", "cli", firmwares=len(timeline)):
+            trend, comparison = analyzer.analyze(timeline)
+        trend.echo()
+        if self.trend_report is not None:
+            trend.write(self.trend_report)
+            click.echo(f"Trend report written to {self.trend_report}")
+
+        recent_id = timeline[-2]["id"]
+        click.echo(f"Previous firmware results: {self.get_firmware_ui_url(recent_id)}")
+        results = self._comparison_findings(comparison)
+        self._echo_changes(recent_id, results)
+        return results
+
+    def _compare_results(self, recent_id: str | None):
+        with tracing.span("compare results", "cli"):
+            results = self._query_results(recent_id)
+        self._echo_changes(recent_id, results)
+        return results
+
+    def _query_results(self, recent_id: str | None):
+        finding_filter = self.finding_filter
         if recent_id is not None:
             click.echo(
                 f"Previous firmware results: {self.get_firmware_ui_url(recent_id)}"
             )
             res = self.client.query(
-                COMPARE_FIRMWARE, {"base": recent_id, "other": self.firmware_id}
+                finding_filter.compare_firmware_query(),
+                {"base": recent_id, "other": self.firmware_id},
             )
-            new_issues = res["compareFirmwareAnalyses"]["issues"]["new"]
-            dropped_issues = res["compareFirmwareAnalyses"]["issues"]["dropped"]
-            new_cves = {
-                tuple(cve_entry.items())
-                for cve_entry in res["compareFirmwareAnalyses"]["cveEntries"]["new"]
-            }
-            dropped_cves = {
-                cve_entry["id"]
-                for cve_entry in res["compareFirmwareAnalyses"]["cveEntries"]["dropped"]
-            }
-        else:
-            click.echo("No previous firmware has been uploaded")
-            res = self.client.query(LATEST_ISSUES_QUERY, {"id": self.firmware_id})
-            new_issues = res["firmware"]["latestIssues"]
-            dropped_issues = []
-            new_cves = {
-                tuple(cve_match["cve"].items())
-                for cve_match in res["firmware"]["cveMatches"]
-            }
-            dropped_cves = []
+            return self._comparison_findings(res["compareFirmwareAnalyses"])
+
+        click.echo("No previous firmware has been uploaded")
+        res = finding_filter.query_latest_results(self.client, self.firmware_id)
+        new_issues = res["latestIssues"]
+        new_cves = {tuple(cve_match["cve"].items()) for cve_match in res["cveMatches"]}
+        return new_issues, [], new_cves, []
+
+    def _comparison_findings(self, comparison: dict):
+        finding_filter = self.finding_filter
+        issues = comparison["issues"]
+        cve_entries = comparison["cveEntries"]
+        new_issues = finding_filter.issues(issues["new"])
+        dropped_issues = finding_filter.issues(issues["dropped"])
+        new_cves = {
+            tuple(cve_entry.items())
+            for cve_entry in finding_filter.cves(cve_entries["new"])
+        }
+        dropped_cves = {
+            cve_entry["id"] for cve_entry in finding_filter.cves(cve_entries["dropped"])
+        }
+        return new_issues, dropped_issues, new_cves, dropped_cves
 
+    def _echo_changes(self, recent_id: str | None, results):
+        new_issues, dropped_issues, new_cves, dropped_cves = results
         click.echo("#" * 80)
         click.echo(
             f"New / dropped issue count: {len(new_issues)} / {len(dropped_issues)}"
@@ -96,52 +280,132 @@ class ResultHandler:
         else:
             click.echo("No changes since previous firmware")
 
-        return new_issues, dropped_issues, new_cves, dropped_cves
-
     def wait_for_analysis_finish(self):
         click.echo(f"Waiting for analysis to finish on firmware: {self.firmware_id}")
+        try:
+            with tracing.span("wait for analysis", "cli", strategy=self.wait_strategy):
+                if self.wait_strategy == "subscribe" and self._wait_with_subscription():
+                    return
+                while not self._poll_analysis_state():
+                    with tracing.span("check interval", "wait"):
+                        time.sleep(self.check_interval)
+        except Exception as e:
+            click.echo(f"Error fetching results {e!s}")
+            sys.exit(10)
+
+    def is_analysis_finished(self) -> bool:
+        """Check the analysis state once, exits like wait_for_analysis_finish on failure."""
+        try:
+            return self._poll_analysis_state()
+        except Exception as e:
+            click.echo(f"Error fetching results {e!s}")
+            sys.exit(10)
+
+    def _wait_with_subscription(self) -> bool:
+        """Wait for analysis state changes pushed by the platform.
+
+        Returns False if subscriptions are not available, the first connection
+        fails, the subscription is rejected (e.g. the platform lacks the
+        `firmwareLatestAnalysis` field) or the connection could not be
+        re-established, the caller has to poll then.
+        """
+        try:
+            self._follow_subscription()
+        except (errors.SubscriptionUnavailable, errors.QueryError) as e:
+            click.echo(
+                f"Subscriptions are not available, falling back to polling; error='{e!s}'"
+            )
+            return False
+        except errors.SubscriptionDisconnected as e:
+            click.echo(
+                f"Subscription connection failed, falling back to polling; error='{e!s}'"
+            )
+            return False
+        return True
+
+    def _follow_subscription(self):
+        # consecutive failed reconnects, analyses may run for hours with many reconnects
+        reconnect_count = 0
+        connected = False
         while True:
+            self.client.refresh_tenant_token()
+            subscription = self.client.subscribe(
+                load_query("subscribe_firmware_latest_analysis.graphql"),
+                {"id": self.firmware_id},
+            )
             try:
-                self.client.refresh_tenant_token()
+                with subscription:
+                    reconnect_count = 0
+                    connected = True
+                    # changes before (re)subscribing are not sent, resume from the current state
+                    if self._poll_analysis_state():
+                        return
+                    with tracing.span("subscription", "wait"):
+                        for data in subscription:
+                            if self._analysis_finished(data["firmwareLatestAnalysis"]):
+                                return
+            except errors.SubscriptionIdle:
+                # the platform sends no keep-alives, a quiet connection may be dropped by proxies
+                click.echo("No analysis state change, resubscribing")
+            except errors.SubscriptionDisconnected as e:
+                # e.g. a proxy blocks the WebSocket, don't wait for retries then
+                if not connected or reconnect_count >= self.retry_count:
+                    raise
+                reconnect_count += 1
+                click.echo(f"Subscription connection lost, reconnecting; error='{e!s}'")
+                with tracing.span("retry wait", "wait"):
+                    time.sleep(self.retry_wait)
+                if self._poll_analysis_state():
+                    return
+            else:
+                error = "subscription completed before the analysis finished"
+                raise errors.SubscriptionUnavailable(error)
+
+    def _poll_analysis_state(self) -> bool:
+        with tracing.span("poll analysis state", "cli"):
+            self.client.refresh_tenant_token()
 
-                res = self.client.query(FIRMWARE_STATUS_QUERY, {"id": self.firmware_id})
-                if res["firmware"] is None:
-                    click.echo(
-                        "Firmware is not yet available, analysis not started yet, waiting."
-                    )
-                    time.sleep(self.check_interval)
-                    continue
+            res = self.client.query(
+                load_query("get_firmware_latest_analysis_state.graphql"),
+                {"id": self.firmware_id},
+            )
+        if res["firmware"] is None:
+            click.echo(
+                "Firmware is not yet available, analysis not started yet, waiting."
+            )
+            return False
+        return self._analysis_finished(res["firmware"]["latestAnalysis"])
 
-                latest_analysis = res["firmware"]["latestAnalysis"]
-                if latest_analysis is None:
-                    click.echo("Analysis has not started yet, waiting.")
-                    time.sleep(self.check_interval)
-                    continue
+    def _analysis_finished(self, latest_analysis) -> bool:
+        if latest_analysis is None:
+            click.echo("Analysis has not started yet, waiting.")
+            return False
 
-                if latest_analysis["state"] != "DONE":
-                    click.echo("Firmware analysis still in progress, waiting.")
-                    time.sleep(self.check_interval)
-                    continue
+        if latest_analysis["state"] != "DONE":
+            click.echo("Firmware analysis still in progress, waiting.")
+            return False
 
-                if latest_analysis["result"] != "COMPLETE":
-                    click.echo(
-                        f"Firmware analysis failed, check details: {self.get_firmware_ui_url(self.firmware_id)}"
-                    )
-                    sys.exit(2)
-                else:
-                    click.echo(
-                        f"Firmware analysis finished successfully, results: {self.get_firmware_ui_url(self.firmware_id)}"
-                    )
-                    break
-            except Exception as e:
-                click.echo(f"Error fetching results {e!s}")
-                sys.exit(10)
+        if latest_analysis["result"] != "COMPLETE":
+            click.echo(
+                f"Firmware analysis failed, check details: {self.get_firmware_ui_url(self.firmware_id)}"
+            )
+            sys.exit(2)
+
+        click.echo(
+            f"Firmware analysis finished successfully, results: {self.get_firmware_ui_url(self.firmware_id)}"
+        )
+        return True
 
     def get_recent_firmware_id(self):
-        res = self.client.query(
-            GET_ALL_FIRMWARES, {"id": self.firmware_id, "firmwareCount": 2}
+        return self._recent_firmware_id(self._query_same_product_firmwares())
+
+    def _query_same_product_firmwares(self):
+        return self.client.query(
+            load_query("get_same_product_firmwares.graphql"),
+            {"id": self.firmware_id, "firmwareCount": 2},
         )
 
+    def _recent_firmware_id(self, res):
         firmware_ids = [
             timeline["firmware"]["id"]
             for timeline in res["firmware"]["product"]["firmwareTimeline"]
@@ -173,6 +437,8 @@ class JUnitExporter:
         self.firmware_id = str(firmware_id)
 
     def create_new_issue_testcase(self, issue):
+        from junit_xml import TestCase
+
         url = self.get_firmware_issues_ui_url()
         test_case = TestCase(
             name=issue["id"],
@@ -194,6 +460,8 @@ class JUnitExporter:
         return test_case
 
     def create_new_cve_testcase(self, cve):
+        from junit_xml import TestCase
+
         cve = dict(cve)
         url = self.get_firmware_cves_ui_url()
         test_case = TestCase(name=cve["id"], classname="CVE", status="NEW", url=url)
@@ -211,6 +479,8 @@ class JUnitExporter:
     def generate_junit_xml(
         self, new_issues, dropped_issues, new_cves, dropped_cves, output_path: Path
     ):
+        from junit_xml import TestCase, TestSuite
+
         new_issues_test_cases = [
             self.create_new_issue_testcase(issue) for issue in new_issues
         ]
@@ -255,9 +525,70 @@ class JUnitExporter:
         return f"https://{self.client.api_url.host}/firmwares/cves?firmwareId={self.firmware_id}"
 
 
-@click.command()
-@click.option("--firmware-id", required=True, type=UUID, help="Firmware ID")
-@click.option(
+class CIState:
+    """Firmware submitted by `ci-result --no-wait`, read by `ci-result collect`."""
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        api_url: str,
+        firmware_id: str,
+        previous_firmware_id: str | None,
+        *,
+        previous_resolved: bool = True,
+    ):
+        self.api_url = api_url
+        self.firmware_id = firmware_id
+        self.previous_firmware_id = previous_firmware_id
+        # False if the firmware was not available yet on submit
+        self.previous_resolved = previous_resolved
+
+    @classmethod
+    def load(cls, path: Path) -> CIState:
+        data = json.loads(path.read_text())
+        if data.get("version") != cls.VERSION:
+            error = f"Unsupported state file version: {path}"
+            raise click.ClickException(error)
+        return cls(
+            data["api_url"],
+            data["firmware_id"],
+            data["previous_firmware_id"],
+            previous_resolved=data.get("previous_resolved", True),
+        )
+
+    def save(self, path: Path):
+        data = {
+            "version": self.VERSION,
+            "api_url": self.api_url,
+            "firmware_id": self.firmware_id,
+            "previous_firmware_id": self.previous_firmware_id,
+            "previous_resolved": self.previous_resolved,
+            "submitted_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2))
+        tmp_path.replace(path)
+
+
+def _report_results(
+    client: Client, firmware_id: UUID, results, junit_path: Path | None, exit_code: int
+):
+    new_issues, dropped_issues, new_cves, dropped_cves = results
+
+    if junit_path is not None:
+        with tracing.span("junit export", "cli"):
+            junit_exporter = JUnitExporter(client, firmware_id)
+            junit_exporter.generate_junit_xml(
+                new_issues, dropped_issues, new_cves, dropped_cves, junit_path
+            )
+
+    exit_code = exit_code if new_issues or new_cves else 0
+
+    sys.exit(exit_code)
+
+
+_exit_code_option = click.option(
     "--exit-code-on-new-finding",
     "exit_code",
     type=int,
@@ -265,58 +596,247 @@ class JUnitExporter:
     show_default=True,
     help="Exit code to use when findings are identified compared to previous firmware upload",
 )
-@click.option(
-    "--check-interval",
-    type=int,
-    default=60,
-    show_default=True,
-    help="Wait time between checking for result",
-)
-@click.option(
+_retry_count_option = click.option(
     "--retry-count",
     type=int,
     default=10,
     show_default=True,
     help="Number of times to retry fetching results due to communication problem",
 )
-@click.option(
+_retry_wait_option = click.option(
     "--retry-wait",
     type=int,
     default=60,
     show_default=True,
     help="Wait time between retries due to communication problem",
 )
-@click.option(
+_junit_path_option = click.option(
     "--junit-path",
     type=click.Path(exists=False, path_type=Path),
-    help="File to export JUNIT xml",
+    help="File to export JUNIT xml, without it only the number of findings is fetched",
+)
+_min_severity_option = click.option(
+    "--min-severity",
+    type=click.Choice(SEVERITIES),
+    help="Only report issues and CVEs with at least this severity",
+)
+
+
+def _validate_issue_types(_ctx, _param, values: tuple[str, ...]) -> tuple[str, ...]:
+    issue_types = tuple(value.upper() for value in values)
+    for issue_type in issue_types:
+        if not ENUM_VALUE_RE.fullmatch(issue_type):
+            error = f"invalid issue type: {issue_type}"
+            raise click.BadParameter(error)
+    return issue_types
+
+
+_issue_type_option = click.option(
+    "--issue-type",
+    "issue_types",
+    multiple=True,
+    callback=_validate_issue_types,
+    help="Only report issues of this type (e.g. CRYPTO_KEY), can be repeated",
+)
+_trend_option = click.option(
+    "--trend",
+    type=click.IntRange(min=2),
+    metavar="N",
+    help="Follow the findings over the last N firmwares of the product: when they were first seen, fixed and reappeared",
 )
-@click.pass_obj
+_trend_report_option = click.option(
+    "--trend-report",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File to export the finding history of `--trend` as JSON",
+)
+_state_file_option = click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=DEFAULT_STATE_FILE,
+    show_default=True,
+    help="File recording the submitted firmware between `--no-wait` and `collect`",
+)
+
+
+@click.group(invoke_without_command=True)
+@click.option("--firmware-id", type=UUID, help="Firmware ID (required)")
+@_exit_code_option
+@click.option(
+    "--check-interval",
+    type=int,
+    default=60,
+    show_default=True,
+    help="Wait time between checking for result",
+)
+@click.option(
+    "--wait-strategy",
+    type=click.Choice(["poll", "subscribe"]),
+    default="poll",
+    show_default=True,
+    help="Poll the analysis state or get notified through a GraphQL subscription, falling back to polling",
+)
+@_retry_count_option
+@_retry_wait_option
+@_junit_path_option
+@_min_severity_option
+@_issue_type_option
+@_trend_option
+@_trend_report_option
+@click.option(
+    "--no-wait",
+    is_flag=True,
+    help="Record the firmware in the state file and exit, collect the results later with `ci-result collect`",
+)
+@_state_file_option
+@click.pass_context
 def ci_result(
+    ctx,
+    firmware_id: UUID | None,
+    exit_code: int,
+    retry_count: int,
+    retry_wait: int,
+    check_interval: int,
+    wait_strategy: WaitStrategy,
+    junit_path: Path | None,
+    min_severity: str | None,
+    issue_types: tuple[str, ...],
+    trend: int | None,
+    trend_report: Path | None,
+    no_wait: bool,
+    state_file: Path,
+):
+    """Fetch analysis results for CI."""
+    if ctx.invoked_subcommand is not None:
+        return
+    if firmware_id is None:
+        error = "Missing option '--firmware-id'."
+        raise click.UsageError(error)
+
+    ctx.invoke(
+        _wait_for_result,
+        firmware_id=firmware_id,
+        exit_code=exit_code,
+        retry_count=retry_count,
+        retry_wait=retry_wait,
+        check_interval=check_interval,
+        wait_strategy=wait_strategy,
+        junit_path=junit_path,
+        min_severity=min_severity,
+        issue_types=issue_types,
+        trend=trend,
+        trend_report=trend_report,
+        no_wait=no_wait,
+        state_file=state_file,
+    )
+
+
+@pass_client
+def _wait_for_result(
     client: Client,
     firmware_id: UUID,
     exit_code: int,
     retry_count: int,
     retry_wait: int,
     check_interval: int,
+    wait_strategy: WaitStrategy,
     junit_path: Path | None,
+    min_severity: str | None,
+    issue_types: tuple[str, ...],
+    trend: int | None,
+    trend_report: Path | None,
+    no_wait: bool,
+    state_file: Path,
 ):
-    """Fetch analysis results for CI."""
     handler = ResultHandler(
         client,
         firmware_id,
         retry_count=retry_count,
         retry_wait=retry_wait,
         check_interval=check_interval,
+        wait_strategy=wait_strategy,
+        finding_filter=FindingFilter(
+            min_severity, issue_types, details=junit_path is not None
+        ),
+        trend=trend,
+        trend_report=trend_report,
     )
-    new_issues, dropped_issues, new_cves, dropped_cves = handler.get_result()
 
-    if junit_path is not None:
-        junit_exporter = JUnitExporter(client, firmware_id)
-        junit_exporter.generate_junit_xml(
-            new_issues, dropped_issues, new_cves, dropped_cves, junit_path
+    if no_wait:
+        recent_id, resolved = handler.get_submitted_recent_firmware_id()
+        CIState(
+            str(client.api_url),
+            str(firmware_id),
+            recent_id,
+            previous_resolved=resolved,
+        ).save(state_file)
+        click.echo(
+            f"Firmware {firmware_id} submitted, collect the results with `onekey ci-result collect --state-file {state_file}`"
         )
+        return
 
-    exit_code = exit_code if new_issues or new_cves else 0
+    results = handler.get_result()
+    _report_results(client, firmware_id, results, junit_path, exit_code)
 
-    sys.exit(exit_code)
+
+@ci_result.command()
+@_state_file_option
+@_exit_code_option
+@click.option(
+    "--pending-exit-code",
+    type=int,
+    default=PENDING_EXIT_CODE,
+    show_default=True,
+    help="Exit code to use when the analysis has not finished yet",
+)
+@_retry_count_option
+@_retry_wait_option
+@_junit_path_option
+@_min_severity_option
+@_issue_type_option
+@_trend_option
+@_trend_report_option
+@pass_client
+def collect(
+    client: Client,
+    state_file: Path,
+    exit_code: int,
+    pending_exit_code: int,
+    retry_count: int,
+    retry_wait: int,
+    junit_path: Path | None,
+    min_severity: str | None,
+    issue_types: tuple[str, ...],
+    trend: int | None,
+    trend_report: Path | None,
+):
+    """Check once for the results of a firmware submitted with `--no-wait`."""
+    if not state_file.exists():
+        error = f"State file not found: {state_file}, submit with `ci-result --no-wait` first"
+        raise click.ClickException(error)
+    state = CIState.load(state_file)
+    if state.api_url != str(client.api_url):
+        click.echo(
+            f"Warning: firmware was submitted to {state.api_url}, collecting from {client.api_url}",
+            err=True,
+        )
+
+    firmware_id = UUID(state.firmware_id)
+    handler = ResultHandler(
+        client,
+        firmware_id,
+        retry_count=retry_count,
+        retry_wait=retry_wait,
+        finding_filter=FindingFilter(
+            min_severity, issue_types, details=junit_path is not None
+        ),
+        trend=trend,
+        trend_report=trend_report,
+    )
+    if not handler.is_analysis_finished():
+        click.echo(f"Analysis pending on firmware: {firmware_id}")
+        sys.exit(pending_exit_code)
+
+    results = handler.get_collected_result(
+        state.previous_firmware_id, resolved=state.previous_resolved
+    )
+    _report_results(client, firmware_id, results, junit_path, exit_code)
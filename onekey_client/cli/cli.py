@@ -1,16 +1,76 @@
-import sys
+import functools
+from pathlib import Path
 
 import click
-import httpx
 
-from onekey_client import Client
-
-from .ci import ci_result
-from .firmware_upload import upload_firmware
-from .misc import get_tenant_token, list_tenants
-
-
-@click.group()
+from .auth import ClientFactory
+
+# command name: module, attribute and the first line of its help
+SUBCOMMANDS = {
+    "agent": (
+        "agent",
+        "agent",
+        "Serve other CLI invocations with a logged in client.",
+    ),
+    "ci-result": ("ci", "ci_result", "Fetch analysis results for CI."),
+    "export": (
+        "export",
+        "export",
+        "Export the issues and CVEs of the latest firmwares of all products.",
+    ),
+    "get-tenant-token": (
+        "misc",
+        "get_tenant_token",
+        "Get tenant specific Bearer token.",
+    ),
+    "list-tenants": ("misc", "list_tenants", "List available tenants."),
+    "stats": (
+        "stats",
+        "stats",
+        "Summarize the findings of the latest firmwares or of an export file.",
+    ),
+    "upload-firmware": (
+        "firmware_upload",
+        "upload_firmware",
+        "Upload a firmware / SBOM to the ONEKEY platform.",
+    ),
+    "watch": ("watch", "watch", "Watch a directory and upload new firmwares."),
+}
+
+
+class LazyGroup(click.Group):
+    """Group importing the module of a subcommand only when it is used.
+
+    The command list of `--help` is built from SUBCOMMANDS, so it imports none
+    of them.
+    """
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *SUBCOMMANDS})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in SUBCOMMANDS and cmd_name not in self.commands:
+            module_name, attribute, _ = SUBCOMMANDS[cmd_name]
+            # imports of importlib.import_module are missing from -X importtime
+            module = __import__(f"{__package__}.{module_name}", fromlist=[attribute])
+            self.add_command(getattr(module, attribute), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter):
+        names = self.list_commands(ctx)
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if name in SUBCOMMANDS and name not in self.commands:
+                command = click.Command(name, help=SUBCOMMANDS[name][2])
+            else:
+                command = self.commands[name]
+            rows.append((name, command.get_short_help_str(limit)))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+@click.group(cls=LazyGroup)
 @click.option(
     "--api-url",
     default="https://app.eu.onekey.com/api",
@@ -32,74 +92,100 @@ from .misc import get_tenant_token, list_tenants
 )
 @click.option("--tenant", "tenant_name", help="Tenant name on ONEKEY platform")
 @click.option("--token", help="API token to authenticate on the ONEKEY platform")
+@click.option(
+    "--record",
+    "record_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Record the communication with the platform to a cassette file, secrets are redacted",
+)
+@click.option(
+    "--replay",
+    "replay_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Replay a recorded cassette file instead of connecting to the platform",
+)
+@click.option(
+    "--replay-latency",
+    type=click.Choice(["original", "zero"]),
+    default="original",
+    show_default=True,
+    help="Response latency when replaying a cassette",
+)
+@click.option(
+    "--agent-socket",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Socket of the `onekey agent`  [default: $XDG_RUNTIME_DIR/onekey-agent.sock, or in a private directory in /tmp]",
+)
+@click.option(
+    "--no-agent",
+    is_flag=True,
+    help="Run the command in-process even if an agent is running",
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Record the phases of the run (login, requests, polls, comparison, export) to a Chrome trace file, viewable in Perfetto or speedscope",
+)
+@click.option(
+    "--profile-python",
+    is_flag=True,
+    help="With `--profile`, also profile Python function calls with cProfile, written next to the trace with the .pstats suffix",
+)
 @click.pass_context
-def cli(ctx, api_url, disable_tls_verify, email, password, tenant_name, token):
-    client = Client(api_url=api_url, disable_tls_verify=disable_tls_verify)
-    if token is not None and (
-        email is not None or password is not None or tenant_name is not None
-    ):
-        click.echo(
-            "Invalid authentication details, either specify token or email/password/tenant, but not both!"
-        )
-        sys.exit(1)
-
-    if token is None and (email is None or password is None or tenant_name is None):
-        click.echo(
-            "Invalid authentication details, specify email, password and tenant, if token is not specified!"
-        )
-        sys.exit(1)
-
-    if token is not None:
-        login_with_token(client, token, api_url)
-    else:
-        login_with_email(client, email, password, tenant_name, api_url)
-    ctx.obj = client
-
-
-def login_with_email(client, email, password, tenant_name, api_url):
-    try:
-        client.login(email, password)
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == httpx.codes.UNAUTHORIZED:
-            click.echo(f"Authentication failed on {email} @ {api_url}")
-            sys.exit(1)
-        else:
-            click.echo(
-                f"Error connecting to ONEKEY platform: '{api_url}', error: {e.response.status_code}"
+def cli(
+    ctx,
+    api_url,
+    disable_tls_verify,
+    email,
+    password,
+    tenant_name,
+    token,
+    record_path,
+    replay_path,
+    replay_latency,
+    agent_socket,
+    no_agent,
+    profile_path,
+    profile_python,
+):
+    if record_path is not None and replay_path is not None:
+        error = "`--record` and `--replay` can't be used together"
+        raise click.BadParameter(error)
+
+    if profile_path is not None:
+        from onekey_client import tracing
+
+        tracing.start(profile_python=profile_python)
+        # registered first to run last, after the client is closed
+        ctx.call_on_close(
+            functools.partial(
+                _write_profile, profile_path, f"onekey {ctx.invoked_subcommand}"
             )
-            sys.exit(2)
-
-    try:
-        tenant = client.get_tenant(tenant_name)
-    except KeyError:
-        click.echo(f"Invalid tenant: {tenant_name}")
-        tenants = client.get_all_tenants()
-        click.echo("Available tenants:")
-        for tenant in tenants:
-            click.echo(f"- {tenant.name} ({tenant.id}")
-        sys.exit(3)
-
-    client.use_tenant(tenant)
-
-
-def login_with_token(client, token, api_url):
-    try:
-        client.use_token(token)
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == httpx.codes.UNAUTHORIZED:
-            click.echo(f"Authentication failed with token on {api_url}")
-            sys.exit(1)
-        else:
-            click.echo(
-                f"Error connecting to ONEKEY platform: '{api_url}', error: {e.response.status_code}"
-            )
-            sys.exit(2)
-
+        )
 
-cli.add_command(list_tenants)
-cli.add_command(get_tenant_token)
-cli.add_command(upload_firmware)
-cli.add_command(ci_result)
+    ctx.obj = ClientFactory(
+        api_url,
+        disable_tls_verify,
+        email,
+        password,
+        tenant_name,
+        token,
+        record_path=record_path,
+        replay_path=replay_path,
+        replay_latency=replay_latency,
+        agent_socket=agent_socket,
+        # a profiled command has to run in this process
+        use_agent=not no_agent and profile_path is None,
+    )
+    ctx.call_on_close(ctx.obj.close)
+
+
+def _write_profile(path: Path, name: str):
+    from onekey_client import tracing
+
+    tracing.stop().write(path, name)
+    click.echo(f"Profile written to {path}", err=True)
 
 
 def main():
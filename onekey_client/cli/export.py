@@ -0,0 +1,403 @@
+"""Tenant-wide export of the findings of the latest firmwares.
+
+The results of a firmware are parsed while they are received and written as
+rows to a spool file by the worker fetching them, which is appended to the
+output once complete. Memory use grows neither with the size of the fleet nor
+with the results of a single firmware. After each firmware the
+output size is appended to a checkpoint file; an interrupted export is resumed
+by truncating the output to the last checkpoint and skipping the firmwares
+already exported. Parquet files can't be appended to, they are converted from a
+JSON Lines spool file at the end.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import contextvars
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, TypeVar
+
+import click
+
+from onekey_client.queries import load_query
+
+from .auth import pass_client
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from onekey_client import Client
+
+ExportFormat = Literal["csv", "jsonl", "parquet"]
+T = TypeVar("T")
+
+FIELDS = [
+    "kind",
+    "product_group",
+    "vendor",
+    "product",
+    "firmware_id",
+    "firmware_name",
+    "firmware_version",
+    "id",
+    "type",
+    "severity",
+    "path",
+    "component_name",
+    "component_version",
+    "description",
+]
+PARQUET_BATCH_SIZE = 10_000
+ROW_BATCH_SIZE = 1_000
+ISSUES_PATH = ("firmware", "latestIssues")
+CVES_PATH = ("firmware", "cveMatches")
+
+
+def _format_from_suffix(path: Path) -> ExportFormat:
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        return "parquet"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def firmware_rows(
+    firmware: dict, findings: Iterable[tuple[tuple[str, ...], dict]]
+) -> Iterator[dict]:
+    """Rows of the findings of a firmware, as yielded by `Client.query_stream_lists`."""
+    for path, finding in findings:
+        if path == ISSUES_PATH:
+            yield {
+                **firmware,
+                "kind": "issue",
+                "id": finding["id"],
+                "type": finding["type"],
+                "severity": finding["severity"],
+                "path": finding["file"]["path"],
+            }
+        else:
+            component = finding["component"] or {}
+            yield {
+                **firmware,
+                "kind": "cve",
+                "id": finding["cve"]["id"],
+                "severity": finding["cve"]["severity"],
+                "component_name": component.get("name"),
+                "component_version": component.get("version"),
+                "description": finding["cve"]["description"],
+            }
+
+
+def _encode_rows(rows: Iterable[dict], export_format: ExportFormat) -> bytes:
+    buffer = io.StringIO()
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, FIELDS, lineterminator="\n")
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps({field: row.get(field) for field in FIELDS}))
+            buffer.write("\n")
+    return buffer.getvalue().encode()
+
+
+def _write_rows(f, rows: Iterable[dict], export_format: ExportFormat):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, ROW_BATCH_SIZE)):
+        f.write(_encode_rows(batch, export_format))
+
+
+class ExportCheckpoint:
+    """Append-only record of the exported firmwares and the output size after each."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: set[str] = set()
+        self.offset = 0
+        if path.exists():
+            with path.open() as f:
+                for line in f:
+                    # the last line may be incomplete after a crash
+                    if not line.endswith("\n"):
+                        break
+                    entry = json.loads(line)
+                    self.done.add(entry["firmware_id"])
+                    self.offset = entry["offset"]
+        self._file = None
+
+    def __enter__(self):
+        self._file = self.path.open("a")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+    def add(self, firmware_id: str, offset: int):
+        self._file.write(json.dumps({"firmware_id": firmware_id, "offset": offset}))
+        self._file.write("\n")
+        self._file.flush()
+        self.done.add(firmware_id)
+        self.offset = offset
+
+
+class Exporter:
+    """Fetch firmware results with a bounded number of concurrent queries.
+
+    The rows of each firmware are passed to a consumer function while they
+    are received, in the worker thread fetching them.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        *,
+        concurrency: int,
+        retry_count: int,
+        retry_wait: float,
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.retry_count = retry_count
+        self.retry_wait = retry_wait
+        self.failed = 0
+
+    def latest_firmwares(self, product_groups: tuple[str, ...]) -> list[dict]:
+        res = self.client.query(load_query("get_latest_firmwares.graphql"))
+        firmwares = []
+        for product_group in res["allProductGroups"]:
+            if product_groups and product_group["name"] not in product_groups:
+                continue
+            for product in product_group["products"]:
+                for timeline in product["firmwareTimeline"]:
+                    firmware = timeline["firmware"]
+                    firmwares.append(
+                        {
+                            "product_group": product_group["name"],
+                            "vendor": product["vendor"]["name"],
+                            "product": product["name"],
+                            "firmware_id": firmware["id"],
+                            "firmware_name": firmware["name"],
+                            "firmware_version": firmware["version"],
+                        }
+                    )
+        return firmwares
+
+    def _fetch(
+        self, firmware: dict, consume: Callable[[Iterator[dict]], T]
+    ) -> T | None:
+        import httpx
+
+        from onekey_client.client import TOKEN_REFRESH_INTERVAL
+
+        for attempt in range(1, self.retry_count + 2):
+            try:
+                self.client.refresh_tenant_token(max_age=TOKEN_REFRESH_INTERVAL)
+                # a firmware deleted since listing it has no findings
+                findings = self.client.query_stream_lists(
+                    load_query("get_firmware_latest_results.graphql"),
+                    (ISSUES_PATH, CVES_PATH),
+                    {"id": firmware["firmware_id"]},
+                )
+                return consume(firmware_rows(firmware, findings))
+            except httpx.HTTPError as e:
+                if attempt > self.retry_count:
+                    click.echo(
+                        f"Error fetching results of {firmware['firmware_id']}, giving up; error='{e!s}'"
+                    )
+                    return None
+                click.echo(
+                    f"Error fetching results of {firmware['firmware_id']}, retrying; error='{e!s}'"
+                )
+                time.sleep(self.retry_wait * attempt)
+        return None
+
+    def results(
+        self, firmwares: list[dict], consume: Callable[[Iterator[dict]], T]
+    ) -> Iterator[tuple[dict, T]]:
+        """Yield firmwares with what consume returned for their rows, in completion order.
+
+        consume is called again with new rows when fetching is retried. At
+        most twice the concurrency results are pending, so a slow caller does
+        not pile them up.
+        """
+        firmware_iter = iter(firmwares)
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as executor:
+            pending = {}
+            try:
+                while True:
+                    for firmware in firmware_iter:
+                        # in the caller's context, for output redirected by the agent
+                        future = executor.submit(
+                            contextvars.copy_context().run,
+                            self._fetch,
+                            firmware,
+                            consume,
+                        )
+                        pending[future] = firmware
+                        if len(pending) >= 2 * self.concurrency:
+                            break
+                    if not pending:
+                        return
+                    finished, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        firmware = pending.pop(future)
+                        result = future.result()
+                        if result is None:
+                            self.failed += 1
+                        else:
+                            yield firmware, result
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def _convert_to_parquet(spool_path: Path, output: Path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        error = "Parquet export requires pyarrow, install onekey-client[parquet]"
+        raise click.ClickException(error) from None
+
+    schema = pa.schema([(field, pa.string()) for field in FIELDS])
+    tmp_path = output.with_name(output.name + ".tmp")
+    with spool_path.open() as f, pq.ParquetWriter(tmp_path, schema) as writer:
+        batch = []
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema))
+    tmp_path.replace(output)
+
+
+@click.command()
+@click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(["csv", "jsonl", "parquet"]),
+    help="Output format  [default: from the OUTPUT suffix, csv otherwise]",
+)
+@click.option(
+    "--product-group",
+    "product_groups",
+    multiple=True,
+    help="Only export firmwares of this product group, can be repeated",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of concurrent result queries",
+)
+@click.option(
+    "--checkpoint",
+    "checkpoint_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="File recording the progress to resume interrupted exports  [default: OUTPUT.checkpoint]",
+)
+@click.option(
+    "--retry-count",
+    type=int,
+    default=3,
+    show_default=True,
+    help="Number of times to retry fetching the results of a firmware",
+)
+@click.option(
+    "--retry-wait",
+    type=float,
+    default=10,
+    show_default=True,
+    help="Wait time between retries",
+)
+@pass_client
+def export(
+    client: Client,
+    output: Path,
+    export_format: ExportFormat | None,
+    product_groups: tuple[str, ...],
+    concurrency: int,
+    checkpoint_path: Path | None,
+    retry_count: int,
+    retry_wait: float,
+):
+    """Export the issues and CVEs of the latest firmwares of all products."""
+    export_format = export_format or _format_from_suffix(output)
+    if checkpoint_path is None:
+        checkpoint_path = output.with_name(output.name + ".checkpoint")
+    if export_format == "parquet":
+        rows_path, rows_format = output.with_name(output.name + ".jsonl"), "jsonl"
+    else:
+        rows_path, rows_format = output, export_format
+
+    exporter = Exporter(
+        client,
+        concurrency=concurrency,
+        retry_count=retry_count,
+        retry_wait=retry_wait,
+    )
+    with ExportCheckpoint(checkpoint_path) as checkpoint:
+        firmwares = [
+            firmware
+            for firmware in exporter.latest_firmwares(product_groups)
+            if firmware["firmware_id"] not in checkpoint.done
+        ]
+        if checkpoint.done:
+            click.echo(
+                f"Resuming export, {len(checkpoint.done)} firmwares already exported"
+            )
+
+        with (
+            rows_path.open("ab") as f,
+            tempfile.TemporaryDirectory(
+                prefix=".onekey-export-", dir=rows_path.parent
+            ) as spool_dir,
+        ):
+
+            def spool(rows: Iterator[dict]) -> Path:
+                fd, name = tempfile.mkstemp(dir=spool_dir)
+                try:
+                    with os.fdopen(fd, "wb") as spool_file:
+                        _write_rows(spool_file, rows, rows_format)
+                except BaseException:
+                    Path(name).unlink()
+                    raise
+                return Path(name)
+
+            # drop rows written after the last checkpoint
+            f.truncate(checkpoint.offset)
+            if rows_format == "csv" and checkpoint.offset == 0:
+                f.write(",".join(FIELDS).encode() + b"\n")
+            for firmware, spool_path in exporter.results(firmwares, spool):
+                with spool_path.open("rb") as spool_file:
+                    shutil.copyfileobj(spool_file, f)
+                spool_path.unlink()
+                f.flush()
+                checkpoint.add(firmware["firmware_id"], f.tell())
+
+    if exporter.failed:
+        click.echo(
+            f"Results of {exporter.failed} firmwares could not be fetched, run the export again to resume"
+        )
+        sys.exit(1)
+
+    if export_format == "parquet":
+        _convert_to_parquet(rows_path, output)
+        rows_path.unlink()
+    checkpoint_path.unlink()
+    click.echo(f"Exported {len(checkpoint.done)} firmwares to {output}")
@@ -1,11 +1,38 @@
+from __future__ import annotations
+
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
 
-from onekey_client import Client, FirmwareMetadata
 from onekey_client.errors import QueryError
 
+from .auth import pass_client
+
+if TYPE_CHECKING:
+    from onekey_client import Client
+    from onekey_client.content_encoding import Compression
+
+
+def _validate_compression(_ctx, _param, value: str | None) -> str | None:
+    if value not in (None, "auto"):
+        from onekey_client.content_encoding import available_encodings
+
+        if value not in available_encodings():
+            error = "zstd requires Python 3.14 or the zstandard package, install onekey-client[zstd]"
+            raise click.BadParameter(error)
+    return value
+
+
+compress_option = click.option(
+    "--compress",
+    "compression",
+    type=click.Choice(["auto", "gzip", "zstd"]),
+    callback=_validate_compression,
+    help="Compress the upload while sending it, if the platform accepts compressed uploads; `auto` picks the best encoding it supports",
+)
+
 
 @click.command()
 @click.option(
@@ -35,10 +62,11 @@ from onekey_client.errors import QueryError
 @click.option(
     "--sbom", help="Firmware SBOM", type=click.Path(exists=True, path_type=Path)
 )
+@compress_option
 @click.argument(
     "filename", type=click.Path(exists=True, path_type=Path), required=False
 )
-@click.pass_obj
+@pass_client
 def upload_firmware(
     client: Client,
     product_name: str,
@@ -48,6 +76,7 @@ def upload_firmware(
     version: str | None,
     name: str | None,
     sbom: Path | None,
+    compression: Compression | None,
     filename: Path | None,
 ):
     """Upload a firmware / SBOM to the ONEKEY platform."""
@@ -55,8 +84,8 @@ def upload_firmware(
         error = "Either `--sbom` or `FILENAME` or both must be provided"
         raise click.BadParameter(error)
 
-    product_group_id = _get_product_group_id_by_name(client, product_group_name)
-    analysis_configuration_id = _get_analysis_configuration_id_by_name(
+    product_group_id = get_product_group_id_by_name(client, product_group_name)
+    analysis_configuration_id = get_analysis_configuration_id_by_name(
         client, analysis_configuration_name
     )
 
@@ -68,6 +97,8 @@ def upload_firmware(
             else f"{vendor_name}-{product_name}-{version}"
         )
 
+    from onekey_client import FirmwareMetadata
+
     metadata = FirmwareMetadata(
         name=name,
         vendor_name=vendor_name,
@@ -79,7 +110,11 @@ def upload_firmware(
 
     try:
         res = client.upload_firmware(
-            metadata, filename, sbom_path=sbom, enable_monitoring=False
+            metadata,
+            filename,
+            sbom_path=sbom,
+            enable_monitoring=False,
+            compression=compression,
         )
         click.echo(res["id"])
     except QueryError as e:
@@ -89,7 +124,8 @@ def upload_firmware(
         sys.exit(11)
 
 
-def _get_product_group_id_by_name(client: Client, product_group_name: str):
+def get_product_group_id_by_name(client: Client, product_group_name: str):
+    """Return the id of a product group, exit listing the available ones if missing."""
     product_groups = client.get_product_groups()
 
     try:
@@ -102,9 +138,10 @@ def _get_product_group_id_by_name(client: Client, product_group_name: str):
         sys.exit(10)
 
 
-def _get_analysis_configuration_id_by_name(
+def get_analysis_configuration_id_by_name(
     client: Client, analysis_configuration_name: str
 ):
+    """Return the id of an analysis configuration, exit listing the available ones if missing."""
     analysis_configurations = client.get_analysis_configurations()
 
     try:
@@ -1,12 +1,18 @@
+from __future__ import annotations
+
 import json
+from typing import TYPE_CHECKING
 
 import click
 
-from onekey_client import Client
+from .auth import pass_client
+
+if TYPE_CHECKING:
+    from onekey_client import Client
 
 
 @click.command()
-@click.pass_obj
+@pass_client
 def list_tenants(client: Client):
     """List available tenants."""
     tenants = client.get_all_tenants()
@@ -15,7 +21,7 @@ def list_tenants(client: Client):
 
 
 @click.command()
-@click.pass_obj
+@pass_client
 def get_tenant_token(client: Client):
     """Get tenant specific Bearer token."""
     click.echo(json.dumps(client.get_auth_headers()))
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import click
+
+from .auth import ClientFactory
+
+if TYPE_CHECKING:
+    from onekey_client.analytics import FindingsTable
+
+
+def _load_from_platform(
+    ctx: click.Context, product_groups: tuple[str, ...], concurrency: int
+) -> FindingsTable:
+    from onekey_client.analytics import TableBuilder
+
+    from .export import Exporter
+
+    client = ctx.find_object(ClientFactory).get_client()
+    exporter = Exporter(client, concurrency=concurrency, retry_count=3, retry_wait=10)
+    builder = TableBuilder()
+    firmwares = exporter.latest_firmwares(product_groups)
+    for _, rows in exporter.results(firmwares, list):
+        builder.add_rows(rows)
+    if exporter.failed:
+        # statistics over part of the fleet would look complete
+        click.echo(
+            f"Results of {exporter.failed} firmwares could not be fetched, statistics are not computed"
+        )
+        sys.exit(1)
+    return builder.build()
+
+
+def _summarize(table: FindingsTable, top: int) -> dict:
+    cves = table.filter(kind="cve")
+    issues = table.filter(kind="issue")
+    products, severities, histogram = table.crosstab("product", "severity")
+    # keep the products with the most findings
+    top_products = (-histogram.sum(axis=1)).argsort(kind="stable")[:top]
+    return {
+        "findings": len(table),
+        "firmwares": len(table.count_by("firmware_id")),
+        "top_cves": [
+            {"id": cve_id, "firmwares": count}
+            for cve_id, count in cves.count_by("id", distinct="firmware_id", top=top)
+        ],
+        "top_components": [
+            {"component": component, "cves": count}
+            for component, count in cves.count_by(
+                "component_name", distinct="id", top=top
+            )
+        ],
+        "issue_types": [
+            {"type": issue_type, "issues": count}
+            for issue_type, count in issues.count_by("type", top=top)
+        ],
+        "severity_by_product": {
+            products[i]: dict(zip(severities, map(int, histogram[i]), strict=True))
+            for i in top_products
+        },
+    }
+
+
+def _echo_table(title: str, header: list[str], rows: list[list]):
+    click.echo(f"\n{title}")
+    if not rows:
+        click.echo("  (none)")
+        return
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(header, *rows, strict=True)
+    ]
+    for row in [header, *rows]:
+        click.echo(
+            "  "
+            + "  ".join(
+                str(value).ljust(width) if i == 0 else str(value).rjust(width)
+                for i, (value, width) in enumerate(zip(row, widths, strict=True))
+            )
+        )
+
+
+def _echo_summary(summary: dict):
+    _echo_table(
+        "Top CVEs by affected firmwares",
+        ["CVE", "Firmwares"],
+        [[entry["id"], entry["firmwares"]] for entry in summary["top_cves"]],
+    )
+    _echo_table(
+        "Top components by CVEs",
+        ["Component", "CVEs"],
+        [[entry["component"], entry["cves"]] for entry in summary["top_components"]],
+    )
+    _echo_table(
+        "Top issue types",
+        ["Type", "Issues"],
+        [[entry["type"], entry["issues"]] for entry in summary["issue_types"]],
+    )
+    severity_by_product = summary["severity_by_product"]
+    severities = next(iter(severity_by_product.values()), {}).keys()
+    _echo_table(
+        "Severity histogram of the products with most findings",
+        ["Product", *severities],
+        [
+            [product, *counts.values()]
+            for product, counts in severity_by_product.items()
+        ],
+    )
+
+
+@click.command()
+@click.argument(
+    "export_path",
+    metavar="[EXPORT_FILE]",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--product-group",
+    "product_groups",
+    multiple=True,
+    help="Only include firmwares of this product group, can be repeated",
+)
+@click.option(
+    "--severity",
+    "severities",
+    multiple=True,
+    type=click.Choice(["NONE", "LOW", "MEDIUM", "HIGH", "CRITICAL"]),
+    help="Only include findings of this severity, can be repeated",
+)
+@click.option(
+    "--top", type=int, default=10, show_default=True, help="Number of entries listed"
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of concurrent result queries when reading from the platform",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the statistics as JSON")
+@click.pass_context
+def stats(
+    ctx,
+    export_path: Path | None,
+    product_groups: tuple[str, ...],
+    severities: tuple[str, ...],
+    top: int,
+    concurrency: int,
+    as_json: bool,
+):
+    """Summarize the findings of the latest firmwares or of an export file.
+
+    Without EXPORT_FILE the results are fetched from the platform, like with
+    `onekey export`.
+    """
+    try:
+        from onekey_client.analytics import FindingsTable
+    except ImportError:
+        error = "Statistics require numpy, install onekey-client[analytics]"
+        raise click.ClickException(error) from None
+
+    if export_path is None:
+        table = _load_from_platform(ctx, product_groups, concurrency)
+    else:
+        table = FindingsTable.read(export_path)
+
+    start = time.perf_counter()
+    criteria = {}
+    if product_groups:
+        criteria["product_group"] = product_groups
+    if severities:
+        criteria["severity"] = severities
+    if criteria:
+        table = table.filter(**criteria)
+    summary = _summarize(table, top)
+    elapsed = time.perf_counter() - start
+
+    if as_json:
+        click.echo(json.dumps(summary, indent=2))
+        return
+    click.echo(
+        f"{summary['findings']} findings of {summary['firmwares']} firmwares, aggregated in {elapsed * 1000:.1f} ms"
+    )
+    _echo_summary(summary)
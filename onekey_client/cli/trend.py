@@ -0,0 +1,204 @@
+"""Finding history over the last firmwares of a product, for `ci-result --trend`.
+
+The comparisons of each firmware with its predecessor are fetched concurrently
+and replayed from the oldest firmware on, recording for every finding when it
+was first seen, when it was fixed and when a fixed finding reappeared.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import itertools
+import json
+from typing import TYPE_CHECKING
+
+import click
+
+from onekey_client.queries import load_query
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from onekey_client import Client
+
+    from .ci import FindingFilter
+
+# newer uploads of the product may precede the firmware in the timeline
+TIMELINE_MARGIN = 10
+
+
+def _finding_key(kind: str, finding: dict) -> tuple:
+    if kind == "issue":
+        # issue ids belong to an analysis, the same issue in another firmware
+        # is identified by its type and file
+        return (kind, finding["type"], finding["file"]["path"])
+    return (kind, finding["id"])
+
+
+def _firmware_label(firmware: dict) -> str:
+    return firmware.get("version") or firmware.get("name") or firmware["id"]
+
+
+class FindingHistory:
+    def __init__(self, key: tuple, finding: dict, first_seen: str):
+        self.key = key
+        self.severity = finding.get("severity")
+        self.first_seen = first_seen
+        self.fixed_in = None
+        self.regressions: list[tuple[str, str]] = []
+        """(fixed in, reappeared in) versions"""
+
+    @property
+    def present(self) -> bool:
+        return self.fixed_in is None
+
+    def to_json(self) -> dict:
+        kind, *identity = self.key
+        return {
+            "kind": kind,
+            "id": identity[0] if kind == "cve" else None,
+            "type": identity[0] if kind == "issue" else None,
+            "path": identity[1] if kind == "issue" else None,
+            "severity": self.severity,
+            "first_seen": self.first_seen,
+            "fixed_in": self.fixed_in,
+            "regressions": [
+                {"fixed_in": fixed_in, "reappeared_in": reappeared_in}
+                for fixed_in, reappeared_in in self.regressions
+            ],
+        }
+
+
+class Trend:
+    def __init__(self, timeline: list[dict]):
+        self.timeline = timeline
+        self.findings: dict[tuple, FindingHistory] = {}
+
+    def seen(self, kind: str, finding: dict, version: str):
+        key = _finding_key(kind, finding)
+        history = self.findings.get(key)
+        if history is None:
+            self.findings[key] = FindingHistory(key, finding, version)
+        elif not history.present:
+            history.regressions.append((history.fixed_in, version))
+            history.fixed_in = None
+
+    def dropped(self, kind: str, finding: dict, version: str):
+        history = self.findings.get(_finding_key(kind, finding))
+        if history is not None and history.present:
+            history.fixed_in = version
+
+    @property
+    def current(self) -> list[FindingHistory]:
+        return [history for history in self.findings.values() if history.present]
+
+    @property
+    def fixed(self) -> list[FindingHistory]:
+        return [history for history in self.findings.values() if not history.present]
+
+    @property
+    def regressions(self) -> list[FindingHistory]:
+        return [history for history in self.findings.values() if history.regressions]
+
+    def echo(self):
+        versions = [_firmware_label(firmware) for firmware in self.timeline]
+        click.echo(f"Trend over {len(versions)} firmwares: {' -> '.join(versions)}")
+        current = self.current
+        click.echo(f"Findings in current firmware: {len(current)}, first seen in:")
+        for version in versions:
+            count = sum(history.first_seen == version for history in current)
+            if count:
+                click.echo(f"  {version}: {count}")
+        click.echo(f"Findings fixed since {versions[0]}: {len(self.fixed)}")
+        regressions = self.regressions
+        click.echo(f"Regressions (fixed and reappeared): {len(regressions)}")
+        for history in regressions:
+            kind, *identity = history.key
+            steps = ", ".join(
+                f"fixed in {fixed_in}, reappeared in {reappeared_in}"
+                for fixed_in, reappeared_in in history.regressions
+            )
+            state = "" if history.present else f", fixed again in {history.fixed_in}"
+            click.echo(f"  {kind} {' '.join(identity)}: {steps}{state}")
+
+    def write(self, path: Path):
+        report = {
+            "timeline": [
+                {"id": firmware["id"], "version": _firmware_label(firmware)}
+                for firmware in self.timeline
+            ],
+            "findings": [history.to_json() for history in self.findings.values()],
+        }
+        path.write_text(json.dumps(report, indent=2))
+
+
+class TrendAnalyzer:
+    def __init__(
+        self, client: Client, finding_filter: FindingFilter, concurrency: int = 4
+    ):
+        self.client = client
+        self.finding_filter = finding_filter
+        self.concurrency = concurrency
+
+    def get_timeline(self, firmware_id: str, count: int) -> list[dict] | None:
+        """Get the firmware and its count - 1 predecessors, oldest first.
+
+        Returns None if the firmware is not in the recent timeline of its
+        product.
+        """
+        res = self.client.query(
+            load_query("get_product_firmware_timeline.graphql"),
+            {"id": firmware_id, "firmwareCount": count + TIMELINE_MARGIN},
+        )
+        firmwares = [
+            timeline["firmware"]
+            for timeline in res["firmware"]["product"]["firmwareTimeline"]
+        ]
+        ids = [firmware["id"] for firmware in firmwares]
+        if firmware_id not in ids:
+            return None
+        start = ids.index(firmware_id)
+        return list(reversed(firmwares[start : start + count]))
+
+    def _latest_results(self, firmware_id: str) -> dict:
+        return self.finding_filter.query_latest_results(self.client, firmware_id)
+
+    def _compare(self, base_id: str, other_id: str) -> dict:
+        return self.client.query(
+            self.finding_filter.compare_firmware_query(),
+            {"base": base_id, "other": other_id},
+        )["compareFirmwareAnalyses"]
+
+    def analyze(self, timeline: list[dict]) -> tuple[Trend, dict]:
+        """Replay the timeline, returns the trend and the last comparison."""
+        finding_filter = self.finding_filter
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as executor:
+            baseline = executor.submit(self._latest_results, timeline[0]["id"])
+            comparisons = [
+                executor.submit(self._compare, base["id"], other["id"])
+                for base, other in itertools.pairwise(timeline)
+            ]
+            baseline = baseline.result()
+            comparisons = [comparison.result() for comparison in comparisons]
+
+        trend = Trend(timeline)
+        first_version = _firmware_label(timeline[0])
+        for issue in baseline["latestIssues"]:
+            trend.seen("issue", issue, first_version)
+        for cve_match in finding_filter.cves(
+            [cve_match["cve"] for cve_match in baseline["cveMatches"]]
+        ):
+            trend.seen("cve", cve_match, first_version)
+
+        for firmware, comparison in zip(timeline[1:], comparisons, strict=True):
+            version = _firmware_label(firmware)
+            issues, cves = comparison["issues"], comparison["cveEntries"]
+            for issue in finding_filter.issues(issues["new"]):
+                trend.seen("issue", issue, version)
+            for cve in finding_filter.cves(cves["new"]):
+                trend.seen("cve", cve, version)
+            for issue in finding_filter.issues(issues["dropped"]):
+                trend.dropped("issue", issue, version)
+            for cve in finding_filter.cves(cves["dropped"]):
+                trend.dropped("cve", cve, version)
+        return trend, comparisons[-1]
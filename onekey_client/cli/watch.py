@@ -0,0 +1,488 @@
+from __future__ import annotations
+
+import contextlib
+import ctypes
+import ctypes.util
+import datetime as dt
+import json
+import os
+import queue
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import click
+
+from .auth import pass_client
+from .firmware_upload import (
+    compress_option,
+    get_analysis_configuration_id_by_name,
+    get_product_group_id_by_name,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from onekey_client import Client
+    from onekey_client.content_encoding import Compression
+
+DEFAULT_PATTERN = r"(?P<vendor>[^_]+)_(?P<product>[^_]+)_(?P<version>.+)\.[^.]+"
+STATE_FILE_NAME = ".onekey-watch.json"
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal inotify binding, reports files closed after writing or moved in."""
+
+    def __init__(self, libc, fd: int, directory: Path):
+        self._libc = libc
+        self._fd = fd
+        self._directory = directory
+
+    @classmethod
+    def create(cls, directory: Path) -> _Inotify | None:
+        """Return an inotify watch on directory or None if not supported."""
+        if not sys.platform.startswith("linux"):
+            return None
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            return None
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return cls(libc, fd, directory)
+
+    def read(self, timeout: float) -> tuple[list[Path], bool]:
+        """Wait for events, return the written files and whether events were lost."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return [], False
+
+        data = os.read(self._fd, 64 * 1024)
+        paths, overflow, offset = [], False, 0
+        while offset < len(data):
+            _, mask, _, length = _IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += _IN_EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                paths.append(self._directory / os.fsdecode(name))
+        return paths, overflow
+
+    def close(self):
+        os.close(self._fd)
+
+
+class DirectoryWatcher:
+    """Report files in a directory once they are fully written.
+
+    Uses inotify where available, falls back to polling the directory. Files
+    found by scanning are reported when their size and modification time did
+    not change for `settle_time` seconds, inotify reports files right after
+    the writer closed them or they were moved into the directory.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        poll_interval: float = 5.0,
+        settle_time: float = 10.0,
+        force_polling: bool = False,
+    ):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.force_polling = force_polling
+        self._pending: dict[Path, tuple[int, int]] = {}
+        self._reported: dict[Path, tuple[int, int]] = {}
+
+    def watch(self, stop: threading.Event, *, once: bool = False) -> Iterator[Path]:
+        inotify = None
+        if not (once or self.force_polling):
+            inotify = _Inotify.create(self.directory)
+            if inotify is None:
+                click.echo("inotify is not available, polling for new files")
+
+        try:
+            self._scan()
+            while not stop.is_set():
+                yield from self._settled()
+                if once and not self._pending:
+                    return
+                if inotify is not None:
+                    yield from self._read_events(inotify)
+                else:
+                    stop.wait(self.poll_interval)
+                    if not once:
+                        self._scan()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _read_events(self, inotify: _Inotify) -> Iterator[Path]:
+        paths, overflow = inotify.read(self.poll_interval)
+        if overflow:
+            self._scan()
+        for path in paths:
+            self._pending.pop(path, None)
+            if _is_candidate(path) and self._report(path):
+                yield path
+
+    def _scan(self):
+        for path in self.directory.iterdir():
+            if path in self._pending or not _is_candidate(path):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # short-lived file, removed again since listing the directory
+                continue
+            if self._reported.get(path) != (stat.st_size, stat.st_mtime_ns):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns)
+
+    def _report(self, path: Path) -> bool:
+        """Record path as reported, False if it was removed meanwhile."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        self._reported[path] = (stat.st_size, stat.st_mtime_ns)
+        return True
+
+    def _settled(self) -> Iterator[Path]:
+        now = time.time_ns()
+        for path, (size, mtime_ns) in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns)
+            elif now - mtime_ns >= self.settle_time * 1e9:
+                del self._pending[path]
+                self._reported[path] = (size, mtime_ns)
+                yield path
+
+
+def _is_candidate(path: Path) -> bool:
+    return not path.name.startswith(".") and path.is_file()
+
+
+class WatchState:
+    """Persistent record of uploaded files, so restarts don't upload them again.
+
+    A file is identified by its path relative to the watched directory, size
+    and modification time, a file rewritten under the same name is uploaded
+    again. Relative paths keep the state valid when the directory is watched
+    through another path, e.g. mounted elsewhere in a container.
+    """
+
+    def __init__(self, path: Path, directory: Path):
+        self.path = path
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._uploads = {}
+        if path.exists():
+            self._uploads = json.loads(path.read_text())["uploads"]
+
+    @staticmethod
+    def _fingerprint(path: Path) -> dict:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _key(self, path: Path) -> str:
+        return path.relative_to(self.directory).as_posix()
+
+    def is_uploaded(self, path: Path) -> bool:
+        with self._lock:
+            entry = self._uploads.get(self._key(path))
+        return entry is not None and all(
+            entry[k] == v for k, v in self._fingerprint(path).items()
+        )
+
+    def mark_uploaded(self, path: Path, firmware_id: str):
+        entry = {
+            **self._fingerprint(path),
+            "firmware_id": firmware_id,
+            "uploaded_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self._uploads[self._key(path)] = entry
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps({"uploads": self._uploads}, indent=2))
+            tmp_path.replace(self.path)
+
+
+class Uploader:
+    """Upload files from a bounded queue with worker threads sharing one Client."""
+
+    def __init__(
+        self,
+        client: Client,
+        state: WatchState,
+        metadata_factory,
+        *,
+        workers: int,
+        queue_size: int,
+        retry_count: int,
+        retry_wait: float,
+        compression: Compression | None = None,
+    ):
+        self.client = client
+        self.state = state
+        self.metadata_factory = metadata_factory
+        self.retry_count = retry_count
+        self.retry_wait = retry_wait
+        self.compression = compression
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"upload-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, path: Path):
+        """Queue a file, blocks while the queue is full."""
+        with self._lock:
+            try:
+                if path in self._in_flight or self.state.is_uploaded(path):
+                    return
+            except FileNotFoundError:
+                return
+            self._in_flight.add(path)
+        self._queue.put(path)
+
+    def join(self):
+        """Finish queued uploads and stop the workers."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _work(self):
+        while (path := self._queue.get()) is not None:
+            try:
+                self._upload(path)
+            except Exception as e:
+                # a dead worker would leave submit() and join() blocked on the full queue
+                click.echo(f"Error uploading {path}; error='{e!s}'")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(path)
+
+    def _upload(self, path: Path):
+        import httpx
+
+        from onekey_client.client import TOKEN_REFRESH_INTERVAL
+        from onekey_client.errors import QueryError
+
+        metadata = self.metadata_factory(path)
+        for attempt in range(1, self.retry_count + 2):
+            try:
+                self.client.refresh_tenant_token(max_age=TOKEN_REFRESH_INTERVAL)
+                res = self.client.upload_firmware(
+                    metadata,
+                    path,
+                    enable_monitoring=False,
+                    compression=self.compression,
+                )
+            except QueryError as e:
+                messages = ", ".join(error["message"] for error in e.errors)
+                click.echo(f"Error uploading {path}: {messages}")
+                return
+            except (httpx.HTTPError, OSError) as e:
+                if attempt > self.retry_count:
+                    click.echo(f"Error uploading {path}, giving up; error='{e!s}'")
+                    return
+                click.echo(f"Error uploading {path}, retrying; error='{e!s}'")
+                time.sleep(self.retry_wait * attempt)
+            else:
+                click.echo(f"Uploaded {path}: {res['id']}")
+                self.state.mark_uploaded(path, res["id"])
+                return
+
+
+@click.command()
+@click.argument(
+    "directory",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+)
+@click.option(
+    "--pattern",
+    default=DEFAULT_PATTERN,
+    show_default=True,
+    help="Regular expression matching file names, with `vendor`, `product` and optional `version` named groups",
+)
+@click.option(
+    "--product-group",
+    "product_group_name",
+    default="Default",
+    show_default=True,
+    help="Product group name to add the firmwares",
+)
+@click.option(
+    "--analysis-configuration",
+    "analysis_configuration_name",
+    default="Default",
+    show_default=True,
+    help="Analysis configuration name",
+)
+@click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help=f"File recording uploaded firmwares  [default: DIRECTORY/{STATE_FILE_NAME}]",
+)
+@click.option(
+    "--workers", type=int, default=2, show_default=True, help="Concurrent uploads"
+)
+@click.option(
+    "--queue-size",
+    type=int,
+    default=16,
+    show_default=True,
+    help="Maximum number of files waiting for upload",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=5.0,
+    show_default=True,
+    help="Seconds between directory scans when polling",
+)
+@click.option(
+    "--settle-time",
+    type=float,
+    default=10.0,
+    show_default=True,
+    help="Seconds a scanned file must be unchanged to be considered fully written",
+)
+@click.option(
+    "--poll",
+    "force_polling",
+    is_flag=True,
+    help="Poll the directory instead of using inotify, e.g. on network file systems",
+)
+@click.option("--once", is_flag=True, help="Upload the files already present and exit")
+@click.option(
+    "--retry-count",
+    type=int,
+    default=3,
+    show_default=True,
+    help="Number of times to retry a failed upload",
+)
+@click.option(
+    "--retry-wait",
+    type=float,
+    default=60,
+    show_default=True,
+    help="Wait time between upload retries",
+)
+@compress_option
+@pass_client
+def watch(
+    client: Client,
+    directory: Path,
+    pattern: str,
+    product_group_name: str,
+    analysis_configuration_name: str,
+    state_file: Path | None,
+    workers: int,
+    queue_size: int,
+    poll_interval: float,
+    settle_time: float,
+    force_polling: bool,
+    once: bool,
+    retry_count: int,
+    retry_wait: float,
+    compression: Compression | None,
+):
+    """Watch a directory and upload new firmwares."""
+    try:
+        name_re = re.compile(pattern)
+    except re.error as e:
+        error = f"Invalid pattern: {e}"
+        raise click.BadParameter(error) from None
+    if not {"vendor", "product"} <= name_re.groupindex.keys():
+        error = "Pattern must have `vendor` and `product` named groups"
+        raise click.BadParameter(error)
+
+    from onekey_client import FirmwareMetadata
+
+    product_group_id = get_product_group_id_by_name(client, product_group_name)
+    analysis_configuration_id = get_analysis_configuration_id_by_name(
+        client, analysis_configuration_name
+    )
+
+    def metadata_factory(path: Path) -> FirmwareMetadata:
+        fields = name_re.fullmatch(path.name).groupdict()
+        vendor, product, version = (
+            fields["vendor"],
+            fields["product"],
+            fields.get("version"),
+        )
+        return FirmwareMetadata(
+            name=f"{vendor}-{product}-{version or path.name}",
+            vendor_name=vendor,
+            product_name=product,
+            version=version,
+            product_group_id=product_group_id,
+            analysis_configuration_id=analysis_configuration_id,
+        )
+
+    state = WatchState(state_file or directory / STATE_FILE_NAME, directory)
+    uploader = Uploader(
+        client,
+        state,
+        metadata_factory,
+        workers=workers,
+        queue_size=queue_size,
+        retry_count=retry_count,
+        retry_wait=retry_wait,
+        compression=compression,
+    )
+    watcher = DirectoryWatcher(
+        directory,
+        poll_interval=poll_interval,
+        settle_time=settle_time,
+        force_polling=force_polling,
+    )
+
+    stop = threading.Event()
+    uploader.start()
+    click.echo(f"Watching {directory} for new firmwares")
+    with contextlib.suppress(KeyboardInterrupt):
+        for path in watcher.watch(stop, once=once):
+            if name_re.fullmatch(path.name) is None:
+                click.echo(f"Skipping {path}, name does not match pattern")
+                continue
+            uploader.submit(path)
+
+    stop.set()
+    click.echo("Waiting for queued uploads to finish")
+    uploader.join()
@@ -1,21 +1,35 @@
+import contextlib
+import copy
 import functools
 import gc
+import re
 import secrets
+import ssl
+import threading
+import time
+from collections.abc import Iterator
 from importlib import resources
 from pathlib import Path
 
 import httpx
-from authlib.jose import jwt
-from authlib.oidc.core import IDToken
 from httpx import URL
 from pydantic import parse_obj_as
 
-from . import errors, keys
+from . import content_encoding, decoding, errors, keys, tracing
 from . import models as m
+from .cassette import RecordingTransport
 from .queries import load_query
+from .subscriptions import Subscription
 
 CLIENT_ID = "ONEKEY Python SDK"
 TOKEN_NAMESPACE = "https://www.onekey.com/"  # noqa: S105 (hardcoded credential)
+TOKEN_REFRESH_INTERVAL = 300
+"""Seconds after which long-running work refreshes the tenant token."""
+_OPERATION_RE = re.compile(r"\s*(?:query|mutation|subscription)\s+(\w+)")
+# statuses of upload endpoints rejecting a chunked or encoded body
+_REFUSED_BODY_STATUSES = frozenset(
+    {httpx.codes.BAD_REQUEST, httpx.codes.LENGTH_REQUIRED, httpx.codes.NOT_IMPLEMENTED}
+)
 
 
 def _login_required(func):
@@ -46,46 +60,81 @@ class Client:
         api_url: str,
         ca_bundle: Path | None = None,
         disable_tls_verify: bool | None = False,
+        *,
+        record_path: Path | None = None,
+        transport: httpx.BaseTransport | None = None,
     ):
+        """Create a client for the ONEKEY platform at api_url.
+
+        With record_path, every request and response is written to a cassette
+        file with secrets redacted. A custom transport can be passed to serve
+        requests by other means, e.g. `cassette.ReplayTransport` to replay a
+        cassette offline.
+        """
         self._api_url = URL(api_url)
-        self._client = self._setup_httpx_client(api_url, ca_bundle, disable_tls_verify)
+        # subscriptions connect directly, they can't go through a custom transport
+        self._tls_verify = None
+        if transport is None:
+            self._tls_verify = self._get_tls_verify(ca_bundle, disable_tls_verify)
+        self._client = self._setup_httpx_client(
+            api_url, self._tls_verify, record_path, transport
+        )
 
         self._id_token_public_key = self._load_key("id-token-public-key")
 
         self._tenant_token_public_key = self._load_key("tenant-token-public-key")
 
         self._state = _LoginState()
+        self._owns_connections = True
 
     def _setup_httpx_client(
         self,
         api_url: str,
-        ca_bundle: Path | None = None,
-        disable_tls_verify: bool | None = False,
+        verify: ssl.SSLContext | bool | None,
+        record_path: Path | None = None,
+        transport: httpx.BaseTransport | None = None,
     ):
+        if transport is None:
+            if record_path is None:
+                return httpx.Client(base_url=api_url, verify=verify)
+            transport = httpx.HTTPTransport(verify=verify)
+
+        if record_path is not None:
+            transport = RecordingTransport(record_path, transport)
+        return httpx.Client(base_url=api_url, transport=transport)
+
+    def _get_tls_verify(
+        self, ca_bundle: Path | None, disable_tls_verify: bool | None
+    ) -> ssl.SSLContext | bool:
         if disable_tls_verify:
-            return httpx.Client(base_url=api_url, verify=False)  # noqa: S501 (TLS certificate validation disabled)
+            return False
 
         if ca_bundle is not None:
             ca = ca_bundle.expanduser()
             if not ca.exists():
                 raise errors.InvalidCABundle
 
-            return httpx.Client(base_url=api_url, verify=str(ca))
+            return ssl.create_default_context(cafile=str(ca))
         with resources.path(keys, "ca.pem") as ca:
-            return httpx.Client(base_url=api_url, verify=str(ca))
+            return ssl.create_default_context(cafile=str(ca))
 
     def _load_key(self, key_name: str, path: Path | None = None):
         if path is not None:
             return path.read_bytes()
-        response = self._client.get(f"/{key_name}.pem")
-        response.raise_for_status()
-        return response.read()
+        with tracing.span("load key", key=key_name):
+            response = self._client.get(f"/{key_name}.pem")
+            response.raise_for_status()
+            return response.read()
 
     @property
     def api_url(self) -> URL:
         return self._api_url
 
     def login(self, email: str, password: str):
+        with tracing.span("login"):
+            self._login(email, password)
+
+    def _login(self, email: str, password: str):
         nonce = secrets.token_urlsafe()
         payload = {
             "email": email,
@@ -94,6 +143,9 @@ class Client:
             "nonce": nonce,
         }
         json_res = self._post("/authorize", json=payload)
+
+        from authlib.oidc.core import IDToken
+
         id_token = _verify_token(
             nonce,
             email,
@@ -123,9 +175,12 @@ class Client:
         self._state.tenant = tenant
 
     def _post(self, path: str, headers: dict | None = None, **kwargs):
-        response = self._client.post(path, headers=headers, **kwargs)
+        with tracing.span(f"POST {path}", "http") as span_args:
+            response = self._client.post(path, headers=headers, **kwargs)
+            span_args["status"] = response.status_code
         response.raise_for_status()
-        return response.json()
+        with tracing.span("decode json", size=len(response.content)):
+            return decoding.loads(response.content)
 
     @_tenant_required
     def _post_with_token(self, path: str, **kwargs):
@@ -150,6 +205,10 @@ class Client:
     @_login_required
     def use_tenant(self, tenant: m.Tenant):
         """Select the Environment (Tenant) you want to work with."""
+        with tracing.span("tenant token", tenant=tenant.name):
+            self._use_tenant(tenant)
+
+    def _use_tenant(self, tenant: m.Tenant):
         nonce = secrets.token_urlsafe()
         payload = {
             "id_token": self._state.raw_id_token,
@@ -166,24 +225,141 @@ class Client:
         )
         self._state.raw_tenant_token = json_res["tenant_token"]
         self._state.tenant = tenant
+        self._state.token_time = time.monotonic()
 
-    @_tenant_required
-    def refresh_tenant_token(self):
+    @_login_required
+    def tenant_session(self, tenant: m.Tenant) -> "Client":
+        """Get a new Client working with tenant, this one is not changed.
+
+        The new Client shares the connections of this one, only this one has to
+        be closed. Without email / password login, only the tenant of the API
+        token is available.
+        """
+        session: Client = copy.copy(self)
+        session._owns_connections = False
+        session._state = _LoginState()
+        session._state.email = self._state.email
+        session._state.tenants = self._state.tenants
+        session._state.raw_id_token = self._state.raw_id_token
         if self._state.raw_id_token is not None:
+            session.use_tenant(tenant)
+        elif tenant == self._state.tenant:
+            session._state.raw_tenant_token = self._state.raw_tenant_token
+            session._state.tenant = tenant
+        else:
+            raise errors.TenantNotAvailable
+        return session
+
+    @_tenant_required
+    def refresh_tenant_token(self, *, max_age: float | None = None):
+        """Get a new tenant token, with max_age only if the current one is older.
+
+        Threads sharing the client can call it before each piece of work, the
+        token is refreshed by one of them. API tokens are not refreshed.
+        """
+        if self._state.raw_id_token is None:
+            return
+        with self._state.token_lock:
+            if (
+                max_age is not None
+                and time.monotonic() - self._state.token_time <= max_age
+            ):
+                return
             self.use_tenant(self._state.tenant)
 
     @_tenant_required
     def query(self, query: str, variables: dict | None = None, timeout=60):
         """Issues a GraphQL query and returns the results."""
-        res = self._post_with_token(
-            "/graphql", json={"query": query, "variables": variables}, timeout=timeout
-        )
+        with tracing.span("query", "graphql", operation=_operation_name(query)):
+            res = self._post_with_token(
+                "/graphql",
+                json={"query": query, "variables": variables},
+                timeout=timeout,
+            )
 
         if "errors" in res:
             raise errors.QueryError(res["errors"])
 
         return res["data"]
 
+    @_tenant_required
+    def query_stream(
+        self,
+        query: str,
+        path: tuple[str, ...],
+        variables: dict | None = None,
+        timeout=60,
+    ) -> Iterator:
+        """Issues a GraphQL query and yields the elements of the list at path.
+
+        path leads from the query data to the list, e.g. `("firmware",
+        "latestIssues")`. The response is parsed while it is received, so only
+        one element is decoded at a time. Errors reported before the data raise
+        errors.QueryError right away, errors after it once the elements are
+        consumed.
+        """
+        for _, item in self.query_stream_lists(query, (path,), variables, timeout):
+            yield item
+
+    @_tenant_required
+    def query_stream_lists(
+        self,
+        query: str,
+        paths: tuple[tuple[str, ...], ...],
+        variables: dict | None = None,
+        timeout=60,
+    ) -> Iterator[tuple[tuple[str, ...], object]]:
+        """Like `query_stream` for several lists, yields their elements with their path.
+
+        The lists are read in a single pass in the order of the response, e.g.
+        the issues and then the CVEs of a firmware.
+        """
+        with (
+            tracing.span("query stream", "graphql", operation=_operation_name(query)),
+            self._client.stream(
+                "POST",
+                "/graphql",
+                headers=self.get_auth_headers(),
+                json={"query": query, "variables": variables},
+                timeout=timeout,
+            ) as response,
+        ):
+            response.raise_for_status()
+            reader = decoding.StreamReader(response.iter_bytes())
+            for key in reader.members():
+                if key == "errors":
+                    raise errors.QueryError(reader.value())
+                if key == "data":
+                    yield from reader.tagged_items(paths)
+                else:
+                    reader.skip()
+
+    @_tenant_required
+    def subscribe(
+        self, query: str, variables: dict | None = None, *, idle_timeout=300
+    ) -> Subscription:
+        """Start a GraphQL subscription over WebSocket.
+
+        Use the returned Subscription as a context manager and iterate it to
+        receive the results. Raises errors.SubscriptionUnavailable if the client
+        uses a custom transport or the platform does not accept subscriptions.
+        """
+        if self._tls_verify is None:
+            raise errors.SubscriptionUnavailable
+
+        scheme = "wss" if self._api_url.scheme == "https" else "ws"
+        url = self._api_url.copy_with(
+            scheme=scheme, path=self._api_url.path.rstrip("/") + "/graphql"
+        )
+        return Subscription(
+            url,
+            self.get_auth_headers(),
+            self._tls_verify,
+            query,
+            variables,
+            idle_timeout=idle_timeout,
+        )
+
     @_tenant_required
     def upload_firmware(
         self,
@@ -192,9 +368,26 @@ class Client:
         *,
         sbom_path: Path | None = None,
         enable_monitoring: bool,
+        compression: content_encoding.Compression | None = None,
         timeout=60,
     ):
+        """Upload a firmware and / or its SBOM.
+
+        With compression, the files are compressed while they are sent, if the
+        upload endpoint accepts a compressed request: `auto` picks the best
+        encoding it advertises, `gzip` or `zstd` is tried unless the endpoint
+        advertises other encodings only. The files are sent uncompressed when
+        no encoding is accepted or the compressed request is refused.
+
+        Raises ValueError for an unknown compression and
+        errors.CompressionUnavailable if zstd is requested but not installed.
+        """
         assert path is not None or sbom_path is not None
+        if compression is not None and compression not in content_encoding.COMPRESSIONS:
+            error = f"Invalid compression: {compression!r}, expected one of {', '.join(content_encoding.COMPRESSIONS)}"
+            raise ValueError(error)
+        if compression not in (None, "auto", *content_encoding.available_encodings()):
+            raise errors.CompressionUnavailable
 
         variables = {
             "firmware": {
@@ -218,12 +411,83 @@ class Client:
             raise errors.QueryError(res["createFirmwareUpload"]["errors"])
 
         upload_url = res["createFirmwareUpload"]["uploadUrl"]
-
-        files = {}
-        files["firmware"] = path.open("rb") if path is not None else b""
-        if sbom_path is not None:
-            files["sbom"] = sbom_path.open("rb")
-        return self._post_with_token(upload_url, files=files, timeout=timeout)
+        encoding, advertised = None, False
+        if compression is not None:
+            encoding, advertised = self._negotiate_upload_encoding(
+                upload_url, compression
+            )
+
+        with contextlib.ExitStack() as stack:
+            files = {}
+            files["firmware"] = (
+                stack.enter_context(path.open("rb")) if path is not None else b""
+            )
+            if sbom_path is not None:
+                files["sbom"] = stack.enter_context(sbom_path.open("rb"))
+
+            if encoding is not None:
+                res = self._post_compressed(
+                    upload_url, files, encoding, timeout, advertised=advertised
+                )
+                if res is not None:
+                    return res
+                for file in files.values():
+                    if not isinstance(file, bytes):
+                        file.seek(0)
+
+            with tracing.span("upload firmware"):
+                return self._post_with_token(upload_url, files=files, timeout=timeout)
+
+    def _negotiate_upload_encoding(
+        self, upload_url: str, compression: content_encoding.Compression
+    ) -> tuple[str | None, bool]:
+        """Choose the encoding, also returns whether the endpoint advertised its encodings."""
+        with tracing.span("negotiate encoding", "http") as span_args:
+            try:
+                response = self._client.options(
+                    upload_url, headers=self.get_auth_headers()
+                )
+            except httpx.HTTPError:
+                accepted = None
+            else:
+                header = response.headers.get("Accept-Encoding")
+                accepted = content_encoding.accepted_encodings(
+                    header if response.is_success else None
+                )
+            encoding = content_encoding.choose_encoding(compression, accepted)
+            span_args["encoding"] = encoding
+        return encoding, accepted is not None
+
+    def _post_compressed(
+        self, upload_url: str, files: dict, encoding: str, timeout, *, advertised: bool
+    ) -> dict | None:
+        """Post files compressed with encoding, None if the encoding was refused.
+
+        An endpoint that did not advertise its encodings may also refuse the
+        chunked or encoded body with a generic error status.
+        """
+        with tracing.span("upload firmware", encoding=encoding):
+            request = self._client.build_request(
+                "POST",
+                upload_url,
+                files=files,
+                headers=self.get_auth_headers(),
+                timeout=timeout,
+            )
+            # the compressed size is only known once sent
+            del request.headers["Content-Length"]
+            request.headers["Transfer-Encoding"] = "chunked"
+            request.headers["Content-Encoding"] = encoding
+            request.stream = content_encoding.CompressingStream(
+                request.stream, encoding
+            )
+            response = self._client.send(request)
+        if response.status_code == httpx.codes.UNSUPPORTED_MEDIA_TYPE or (
+            not advertised and response.status_code in _REFUSED_BODY_STATUSES
+        ):
+            return None
+        response.raise_for_status()
+        return decoding.loads(response.content)
 
     @_tenant_required
     def get_product_groups(self):
@@ -239,30 +503,51 @@ class Client:
         response = self.query(analysis_configurations_query)
         return {c["name"]: c["id"] for c in response["allAnalysisConfigurations"]}
 
+    def close(self):
+        """Close the connections to the platform and finish a recorded cassette."""
+        if self._owns_connections:
+            self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def logout(self):
         del self._state
         gc.collect()
         self._state = _LoginState()
 
 
+def _operation_name(query: str) -> str | None:
+    match = _OPERATION_RE.match(query)
+    return match.group(1) if match else None
+
+
 def _verify_token(
     nonce: str, email, raw_token: str, public_key: bytes, claims_cls=None
 ):
     """Verify a JWT token signature with the public_key."""
-    claims_options = {
-        "iss": {"essential": True, "value": TOKEN_NAMESPACE},
-        "aud": {"essential": True, "value": CLIENT_ID},
-        "sub": {"essential": True, "value": email},
-    }
-    decoded_token = jwt.decode(
-        raw_token,
-        public_key,
-        claims_cls=claims_cls,
-        claims_options=claims_options,
-        claims_params={"nonce": nonce},
-    )
-    decoded_token.validate()
-    return decoded_token
+    with tracing.span("verify token"):
+        # authlib is only needed for email / password login, API tokens are not
+        # verified locally, so the import is deferred until the first verification
+        from authlib.jose import jwt
+
+        claims_options = {
+            "iss": {"essential": True, "value": TOKEN_NAMESPACE},
+            "aud": {"essential": True, "value": CLIENT_ID},
+            "sub": {"essential": True, "value": email},
+        }
+        decoded_token = jwt.decode(
+            raw_token,
+            public_key,
+            claims_cls=claims_cls,
+            claims_options=claims_options,
+            claims_params={"nonce": nonce},
+        )
+        decoded_token.validate()
+        return decoded_token
 
 
 class _LoginState:
@@ -277,3 +562,5 @@ class _LoginState:
         self.raw_id_token = None
         self.raw_tenant_token = None
         self.tenant = None
+        self.token_time = 0.0
+        self.token_lock = threading.Lock()
@@ -0,0 +1,134 @@
+"""Compression of request bodies while they are sent.
+
+The body is compressed chunk by chunk in a background thread, which also reads
+the files being uploaded, while the compressed chunks already produced are
+sent, so compression overlaps the network I/O. zlib and zstd release the GIL
+while compressing.
+
+gzip is always available, zstd with Python 3.14 or the `zstd` extra. The
+encodings a server accepts in requests are advertised in the `Accept-Encoding`
+header of its OPTIONS response (RFC 7694).
+"""
+
+import functools
+import queue
+import threading
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Literal, get_args
+
+import httpx
+
+from . import errors
+
+Compression = Literal["auto", "gzip", "zstd"]
+COMPRESSIONS: tuple[str, ...] = get_args(Compression)
+
+PREFERENCE = ("zstd", "gzip")
+"""Encodings in the order they are chosen by `auto`."""
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+_QUEUE_SIZE = 16
+_DONE = object()
+
+
+def _zstd_compressor():
+    try:
+        from compression import zstd
+    except ImportError:
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zstd.ZstdCompressor(level=ZSTD_LEVEL)
+
+
+def _compressor(encoding: str):
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _zstd_compressor()
+
+
+@functools.cache
+def available_encodings() -> tuple[str, ...]:
+    try:
+        _zstd_compressor()
+    except ImportError:
+        return ("gzip",)
+    return PREFERENCE
+
+
+def accepted_encodings(header: str | None) -> set[str] | None:
+    """Parse an Accept-Encoding header, None if it is missing."""
+    if header is None:
+        return None
+    accepted = set()
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if coding and "q=0" not in params:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def choose_encoding(compression: Compression, accepted: set[str] | None) -> str | None:
+    """Choose the encoding to compress with, None to send uncompressed.
+
+    If the server did not tell which encodings it accepts, an explicitly
+    requested encoding is tried, `auto` sends uncompressed.
+    """
+    available = available_encodings()
+    if compression == "auto":
+        candidates = available
+    elif compression in available:
+        candidates = (compression,)
+    else:
+        raise errors.CompressionUnavailable
+    if accepted is None:
+        return None if compression == "auto" else compression
+    return next((coding for coding in candidates if coding in accepted), None)
+
+
+class CompressingStream(httpx.SyncByteStream):
+    """Iterate chunks compressed with encoding, compressing in a background thread."""
+
+    def __init__(self, chunks: Iterable[bytes], encoding: str):
+        self._chunks = chunks
+        self._encoding = encoding
+        self._queue = queue.Queue(_QUEUE_SIZE)
+        self._stop = threading.Event()
+
+    def _put(self, item):
+        # give up when the consumer stopped, e.g. the connection was lost
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return
+
+    def _compress(self):
+        try:
+            compressor = _compressor(self._encoding)
+            for chunk in self._chunks:
+                if self._stop.is_set():
+                    return
+                data = compressor.compress(chunk)
+                if data:
+                    self._put(data)
+            self._put(compressor.flush())
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def __iter__(self) -> Iterator[bytes]:
+        thread = threading.Thread(
+            target=self._compress, name="onekey-compress", daemon=True
+        )
+        thread.start()
+        try:
+            while (item := self._queue.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self._stop.set()
+            thread.join()
@@ -0,0 +1,225 @@
+"""JSON decoding of platform responses.
+
+Responses are decoded with orjson when it is installed (the `fast` extra),
+otherwise with the standard library. Either way the garbage collector is paused
+while decoding: the hundreds of thousands of objects of a large result trigger
+repeated collections, which take as long as the decoding itself, while a
+decoded document can't contain reference cycles.
+
+`StreamReader` parses a response incrementally from its chunks instead, so the
+elements of a large list can be processed one by one without holding the whole
+document. Each element is decoded with the C accelerated scanner of the
+standard library as soon as it is complete; values on the way to the list are
+skipped element by element too.
+"""
+
+import codecs
+import gc
+import json
+import re
+import threading
+from collections.abc import Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# characters that may continue a number, up to the end of the buffer
+_NUMBER_TAIL_RE = re.compile(r"[0-9.eE+-]*\Z")
+
+# the collector is process-wide: it is paused while any thread decodes and
+# re-enabled by the last one, if it was enabled before the first one
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+def _pause_gc():
+    global _gc_pauses, _gc_was_enabled  # noqa: PLW0603 (process-wide collector state)
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+
+
+def _resume_gc():
+    global _gc_pauses  # noqa: PLW0603
+    with _gc_lock:
+        _gc_pauses -= 1
+        if _gc_pauses == 0 and _gc_was_enabled:
+            gc.enable()
+
+
+def loads(data: bytes):
+    """Decode a JSON document, with orjson if it is available."""
+    _pause_gc()
+    try:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+    finally:
+        _resume_gc()
+
+
+class StreamReader:
+    """Pull parser over the chunks of a JSON document.
+
+    `members()` and `array()` step into objects and arrays, after each key or
+    element yielded the caller has to consume the value with `value()`,
+    `skip()` or by stepping into it.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the unconsumed part of the buffer."""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._utf8.decode(b"", final=True)
+        else:
+            text = self._utf8.decode(chunk)
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        return True
+
+    def _error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def peek(self) -> str:
+        """Get the next non-whitespace character without consuming it."""
+        while True:
+            self._pos = _WHITESPACE_RE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                error = "Unexpected end of document"
+                raise self._error(error)
+
+    def _expect(self, char: str):
+        if self.peek() != char:
+            error = f"Expecting {char!r}"
+            raise self._error(error)
+        self._pos += 1
+
+    def _next_separator(self, end: str) -> bool:
+        """Consume a ',' or the end of a container, returns whether it ended."""
+        char = self.peek()
+        self._pos += 1
+        if char == end:
+            return True
+        if char != ",":
+            self._pos -= 1
+            error = "Expecting ',' delimiter"
+            raise self._error(error)
+        return False
+
+    def value(self):
+        """Decode the next value completely."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # the value continues in the next chunk, or it is invalid
+                if self._fill():
+                    continue
+                raise
+            # a number at the end of the buffer may continue in the next chunk
+            if _NUMBER_TAIL_RE.match(self._buffer, end) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Step into an object, yields its keys."""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                error = "Expecting property name"
+                raise self._error(error)
+            self._expect(":")
+            yield key
+            if self._next_separator("}"):
+                return
+
+    def array(self) -> Iterator[None]:
+        """Step into an array, yields before each element."""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            if self._next_separator("]"):
+                return
+
+    def skip(self):
+        """Consume the next value, arrays are decoded and dropped element by element."""
+        char = self.peek()
+        if char == "{":
+            for _ in self.members():
+                self.skip()
+        elif char == "[":
+            for _ in self.array():
+                self.value()
+        else:
+            self.value()
+
+    def items(self, path: tuple[str, ...]) -> Iterator:
+        """Yield the elements of the list at path in the next value.
+
+        path is the sequence of object keys leading to the list, nothing is
+        yielded if one of them is missing or null.
+        """
+        for _, item in self.tagged_items((path,)):
+            yield item
+
+    def tagged_items(
+        self, paths: tuple[tuple[str, ...], ...], depth: int = 0
+    ) -> Iterator[tuple[tuple[str, ...], object]]:
+        """Yield the elements of the lists at paths in the next value, with their path.
+
+        Elements are yielded in document order, so several lists of one
+        response are read in a single pass.
+        """
+        if len(paths[0]) == depth:
+            if self.peek() == "[":
+                for _ in self.array():
+                    yield paths[0], self.value()
+            elif self.value() is not None:
+                error = "Expecting list"
+                raise self._error(error)
+            return
+
+        if self.peek() != "{":
+            if self.value() is not None:
+                error = "Expecting object"
+                raise self._error(error)
+            return
+        for key in self.members():
+            matching = tuple(path for path in paths if path[depth] == key)
+            if matching:
+                yield from self.tagged_items(matching, depth + 1)
+            else:
+                self.skip()
+
+
+def iter_items(chunks: Iterable[bytes], path: tuple[str, ...]) -> Iterator:
+    """Yield the elements of the list at path of the JSON document in chunks."""
+    return StreamReader(chunks).items(path)
@@ -22,6 +22,10 @@ class TenantNotSelected(ClientError):
     )
 
 
+class TenantNotAvailable(ClientError):
+    MESSAGE = "Only the tenant of the API token is available, log in with email and password to use other tenants."
+
+
 class InvalidCABundle(ClientError):
     MESSAGE = "The CA bundle is invalid or doesn't exist."
 
@@ -30,6 +34,51 @@ class InvalidAPIToken(ClientError):
     MESSAGE = "The API Token is invalid."
 
 
+class InvalidCassette(ClientError):
+    MESSAGE = "The cassette file is invalid or was recorded by an incompatible version."
+
+
+class ReplayMismatch(ClientError):
+    """raised when a replayed request was not recorded in the cassette."""
+
+    def __init__(self, request_key: str):
+        super().__init__(f"Request not found in cassette: {request_key}")
+        self.request_key = request_key
+
+
+class WebSocketError(ClientError):
+    MESSAGE = "WebSocket communication error."
+
+
+class WebSocketHandshakeError(WebSocketError):
+    """raised when the server refuses to open a WebSocket connection."""
+
+
+class WebSocketClosed(WebSocketError):
+    """raised when the WebSocket connection was closed."""
+
+    def __init__(self, code: int, reason: str = ""):
+        super().__init__(f"WebSocket connection closed: {code} {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+class SubscriptionUnavailable(ClientError):
+    MESSAGE = "GraphQL subscriptions are not available on the platform."
+
+
+class SubscriptionDisconnected(ClientError):
+    MESSAGE = "The GraphQL subscription connection was lost."
+
+
+class SubscriptionIdle(SubscriptionDisconnected):
+    MESSAGE = "No GraphQL subscription event was received within the idle timeout."
+
+
+class CompressionUnavailable(ClientError):
+    MESSAGE = "zstd compression requires Python 3.14 or the zstandard package, install onekey-client[zstd]."
+
+
 class QueryError(ClientError):
     """raised when a GraphQL query returns errors."""
 
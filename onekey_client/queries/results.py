@@ -0,0 +1,138 @@
+"""Trimmed variants of the firmware result queries.
+
+The predefined result queries fetch every finding with all fields, including
+the long CVE descriptions. When only some severities or issue types matter, or
+only the number of findings, these variants select fewer fields and let the
+platform filter the findings of the latest analysis.
+
+The `severity` and `type` fields of the `latestIssues` filter and the `filter`
+argument of `cveMatches` are assumed, following the existing `elf` filter.
+Callers have to fall back to an unfiltered query and filter the findings
+themselves if the platform rejects them.
+"""
+
+import functools
+import re
+import textwrap
+
+from .utils import load_query
+
+SEVERITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+ENUM_VALUE_RE = re.compile(r"[A-Z][A-Z0-9_]*")
+
+_ISSUE_FIELDS = """\
+__typename
+id
+severity
+type
+file {
+  path
+}"""
+_CVE_FIELDS = """\
+id
+description
+severity"""
+_COMPONENT_FIELDS = """\
+component {
+  name
+  version
+}"""
+_ISSUE_COUNT_FIELDS = """\
+id
+severity
+type"""
+_CVE_COUNT_FIELDS = """\
+id
+severity"""
+
+
+def _enum_list(values: tuple[str, ...]) -> str:
+    for value in values:
+        if not ENUM_VALUE_RE.fullmatch(value):
+            error = f"Invalid enum value: {value!r}"
+            raise ValueError(error)
+    return "[" + ", ".join(values) + "]"
+
+
+def _indent(fields: str, spaces: int) -> str:
+    return textwrap.indent(fields, " " * spaces)
+
+
+@functools.lru_cache
+def latest_results_query(
+    severities: tuple[str, ...] | None = None,
+    issue_types: tuple[str, ...] = (),
+    *,
+    details: bool = True,
+) -> str:
+    """Query the latest results of a firmware.
+
+    Only issues and CVEs of the given severities and issues of the given types
+    are returned. Without details only the fields needed to count and filter
+    the findings are fetched.
+    """
+    if severities is None and not issue_types and details:
+        return load_query("get_firmware_latest_results.graphql")
+
+    issue_filter = "elf: false"
+    cve_arguments = ""
+    if severities is not None:
+        issue_filter += f", severity: {_enum_list(severities)}"
+        cve_arguments = f"(filter: {{severity: {_enum_list(severities)}}})"
+    if issue_types:
+        issue_filter += f", type: {_enum_list(issue_types)}"
+
+    issue_fields = _ISSUE_FIELDS if details else _ISSUE_COUNT_FIELDS
+    cve_fields = _CVE_FIELDS if details else _CVE_COUNT_FIELDS
+    component = _indent(_COMPONENT_FIELDS, 6) + "\n" if details else ""
+    return f"""query GetFimrwareLatestResult($id: ID!){{
+  firmware(id: $id) {{
+    latestIssues (filter: {{{issue_filter}}}){{
+{_indent(issue_fields, 6)}
+    }}
+
+    cveMatches{cve_arguments} {{
+{component}      cve {{
+{_indent(cve_fields, 8)}
+      }}
+    }}
+  }}
+}}"""
+
+
+@functools.lru_cache
+def compare_firmware_query(*, details: bool = True, filtered: bool = False) -> str:
+    """Query the comparison of two firmwares.
+
+    Without details only the fields needed for counting are fetched; when
+    filtered, the severity of dropped CVEs is fetched too, for filtering them
+    on the client side.
+    """
+    if details and not filtered:
+        return load_query("compare_firmware.graphql")
+
+    issue_fields = _indent(_ISSUE_FIELDS if details else _ISSUE_COUNT_FIELDS, 8)
+    cve_fields = _indent(_CVE_FIELDS if details else _CVE_COUNT_FIELDS, 8)
+    return f"""query CompareFirmware($base: ID!, $other: ID!){{
+  compareFirmwareAnalyses (base: $base, other: $other) {{
+    issues {{
+      new {{
+{issue_fields}
+      }}
+      dropped {{
+{issue_fields}
+      }}
+    }}
+
+    cveEntries {{
+      new {{
+{cve_fields}
+      }}
+      dropped {{
+        id
+        severity
+      }}
+    }}
+  }}
+}}"""
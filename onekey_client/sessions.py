@@ -0,0 +1,131 @@
+"""Concurrent sessions for many tenants after a single login."""
+
+import concurrent.futures
+from collections.abc import Callable, Iterable
+from typing import TypeVar
+
+from . import models as m
+from .client import Client
+
+T = TypeVar("T")
+
+
+def _tenant_name(tenant: m.Tenant | str) -> str:
+    return tenant.name if isinstance(tenant, m.Tenant) else tenant
+
+
+class _Session:
+    def __init__(self, tenant: m.Tenant, client: Client):
+        self.tenant = tenant
+        self.client = client
+
+
+class SessionPool:
+    """Clients for many tenants of one logged in Client, usable concurrently.
+
+    Tenant tokens are fetched in parallel when the pool is created and each is
+    refreshed on its own once older than token_refresh seconds. All sessions
+    share the connections of the logged in client, close that client when
+    done; closing the pool only stops its worker threads.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        tenants: Iterable[m.Tenant | str] | None = None,
+        *,
+        max_workers: int = 8,
+        token_refresh: float = 300,
+    ):
+        self.token_refresh = token_refresh
+        if tenants is None:
+            selected = client.get_all_tenants()
+        else:
+            selected = [
+                tenant if isinstance(tenant, m.Tenant) else client.get_tenant(tenant)
+                for tenant in tenants
+            ]
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="onekey-session"
+        )
+        try:
+            self._sessions = {
+                session.tenant.name: session
+                for session in self._executor.map(
+                    lambda tenant: _Session(tenant, client.tenant_session(tenant)),
+                    selected,
+                )
+            }
+        except BaseException:
+            # nobody can close a pool that failed to be created
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    @property
+    def tenants(self) -> list[m.Tenant]:
+        return [session.tenant for session in self._sessions.values()]
+
+    def session(self, tenant: m.Tenant | str) -> Client:
+        """Get the Client of tenant, refreshing its token when due.
+
+        Raises KeyError if the tenant is not in the pool.
+        """
+        client = self._sessions[_tenant_name(tenant)].client
+        client.refresh_tenant_token(max_age=self.token_refresh)
+        return client
+
+    def map(
+        self,
+        func: Callable[[Client], T],
+        tenants: Iterable[m.Tenant | str] | None = None,
+        *,
+        return_exceptions: bool = False,
+    ) -> dict[str, T]:
+        """Call func with the Client of every tenant concurrently.
+
+        Returns the results by tenant name. The first exception is raised
+        unless return_exceptions is set, then exceptions are returned as the
+        result of their tenant. Tokens are refreshed when due before func is
+        called, a func working longer than the token lifetime has to call
+        `Client.refresh_tenant_token` with a max_age itself.
+        """
+        names = list(self._sessions) if tenants is None else map(_tenant_name, tenants)
+        futures = {
+            name: self._executor.submit(lambda name=name: func(self.session(name)))
+            for name in names
+        }
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    for pending in futures.values():
+                        pending.cancel()
+                    raise
+                results[name] = e
+        return results
+
+    def query(
+        self,
+        query: str,
+        variables: dict | None = None,
+        tenants: Iterable[m.Tenant | str] | None = None,
+        *,
+        return_exceptions: bool = False,
+    ) -> dict[str, dict]:
+        """Issue a GraphQL query in every tenant, returns the results by tenant name."""
+        return self.map(
+            lambda client: client.query(query, variables),
+            tenants,
+            return_exceptions=return_exceptions,
+        )
@@ -0,0 +1,130 @@
+"""GraphQL subscriptions over WebSocket, using the graphql-transport-ws protocol."""
+
+import contextlib
+import json
+import ssl
+
+from httpx import URL
+
+from . import errors
+from .websocket import WebSocket
+
+SUBPROTOCOL = "graphql-transport-ws"
+
+# Close codes of graphql-transport-ws meaning that retrying will not help
+_UNAVAILABLE_CLOSE_CODES = {4400, 4403, 4406}
+
+
+class Subscription:
+    """A GraphQL subscription, iterating it yields the `data` of each event.
+
+    Use it as a context manager, the connection is opened on enter. Raises
+    `errors.SubscriptionUnavailable` if the platform does not support
+    subscriptions and `errors.SubscriptionDisconnected` if the connection is
+    lost, or its subclass `errors.SubscriptionIdle` if no message arrived for
+    idle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        url: URL,
+        headers: dict,
+        verify: ssl.SSLContext | bool,
+        query: str,
+        variables: dict | None = None,
+        *,
+        connect_timeout: float = 30,
+        idle_timeout: float = 300,
+    ):
+        self.url = url
+        self.headers = headers
+        self.verify = verify
+        self.query = query
+        self.variables = variables
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self._ws = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        try:
+            self._ws = WebSocket.connect(
+                self.url,
+                subprotocol=SUBPROTOCOL,
+                verify=self.verify,
+                timeout=self.connect_timeout,
+            )
+        except errors.WebSocketHandshakeError as e:
+            raise errors.SubscriptionUnavailable(str(e)) from e
+        except OSError as e:
+            raise errors.SubscriptionDisconnected(str(e)) from e
+
+        self._send({"type": "connection_init", "payload": self.headers})
+        try:
+            message = self._recv()
+        except errors.SubscriptionIdle as e:
+            # not an idle subscription, the server never acknowledged the connection
+            self.close()
+            error = "connection not acknowledged in time"
+            raise errors.SubscriptionDisconnected(error) from e
+        if message.get("type") != "connection_ack":
+            self.close()
+            error = f"connection not acknowledged: {message}"
+            raise errors.SubscriptionUnavailable(error)
+
+        self._send(
+            {
+                "id": "1",
+                "type": "subscribe",
+                "payload": {"query": self.query, "variables": self.variables},
+            }
+        )
+        self._ws.settimeout(self.idle_timeout)
+
+    def close(self):
+        if self._ws is None:
+            return
+        with contextlib.suppress(errors.ClientError):
+            self._send({"id": "1", "type": "complete"})
+        self._ws.close()
+        self._ws = None
+
+    def __iter__(self):
+        while True:
+            message = self._recv()
+            message_type = message.get("type")
+            if message_type == "next":
+                payload = message["payload"]
+                if "errors" in payload:
+                    raise errors.QueryError(payload["errors"])
+                yield payload["data"]
+            elif message_type == "error":
+                raise errors.QueryError(message["payload"])
+            elif message_type == "complete":
+                return
+            elif message_type == "ping":
+                self._send({"type": "pong"})
+
+    def _send(self, message: dict):
+        try:
+            self._ws.send(json.dumps(message))
+        except OSError as e:
+            raise errors.SubscriptionDisconnected(str(e)) from e
+
+    def _recv(self) -> dict:
+        try:
+            return json.loads(self._ws.recv())
+        except errors.WebSocketClosed as e:
+            if e.code in _UNAVAILABLE_CLOSE_CODES:
+                raise errors.SubscriptionUnavailable(str(e)) from e
+            raise errors.SubscriptionDisconnected(str(e)) from e
+        except TimeoutError as e:
+            raise errors.SubscriptionIdle from e
+        except OSError as e:
+            raise errors.SubscriptionDisconnected(str(e)) from e
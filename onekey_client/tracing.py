@@ -0,0 +1,126 @@
+"""Phase spans of client and CLI runs, written as Chrome trace files.
+
+While tracing is started, `span()` records how long logging in, loading keys,
+HTTP requests, JSON decoding and the CLI phases took, on which thread. The
+trace file can be opened in Perfetto (https://ui.perfetto.dev), speedscope or
+chrome://tracing. Without a started tracer spans cost next to nothing.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+_tracer = None
+
+
+class Tracer:
+    """Collects complete ("X") events of the Chrome trace event format."""
+
+    def __init__(self, *, profile_python: bool = False):
+        self._origin = time.perf_counter_ns()
+        self._events: list[dict] = []
+        self._threads: dict[int, str] = {}
+        self._profiler = None
+        if profile_python:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _timestamp(self, ns: int) -> float:
+        return (ns - self._origin) / 1000
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args):
+        """Record the duration of the with block, yields args to add results."""
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter_ns()
+            thread = threading.current_thread()
+            self._threads[thread.ident] = thread.name
+            # list.append is atomic, spans of other threads need no lock
+            self._events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": self._timestamp(start),
+                    "dur": (end - start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": thread.ident,
+                    "args": args,
+                }
+            )
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+
+    def write(self, path: Path, name: str):
+        """Write the trace with a span of its whole duration called name.
+
+        Python profiling results are written next to it, with the `.pstats`
+        suffix.
+        """
+        pid = os.getpid()
+        main_thread = threading.main_thread()
+        self._threads.setdefault(main_thread.ident, main_thread.name)
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "onekey"}},
+            *(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": ident,
+                    "args": {"name": thread_name},
+                }
+                for ident, thread_name in self._threads.items()
+            ),
+            {
+                "name": name,
+                "cat": "run",
+                "ph": "X",
+                "ts": 0,
+                "dur": self._timestamp(time.perf_counter_ns()),
+                "pid": pid,
+                "tid": main_thread.ident,
+                "args": {},
+            },
+            *self._events,
+        ]
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+        if self._profiler is not None:
+            self._profiler.dump_stats(path.with_suffix(".pstats"))
+
+
+def start(*, profile_python: bool = False) -> Tracer:
+    """Record spans until `stop()`, with profile_python also run cProfile on this thread."""
+    global _tracer  # noqa: PLW0603 (one tracer per process)
+    _tracer = Tracer(profile_python=profile_python)
+    return _tracer
+
+
+def stop() -> Tracer | None:
+    """Stop recording spans, returns the tracer to write them."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.stop()
+    return tracer
+
+
+def span(name: str, category: str = "client", **args):
+    """Record the duration of a with block if tracing is started.
+
+    The context manager yields args, results known at the end of the block
+    can be added to the span through it.
+    """
+    if _tracer is None:
+        return contextlib.nullcontext(args)
+    return _tracer.span(name, category, **args)
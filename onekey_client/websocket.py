@@ -0,0 +1,192 @@
+"""Minimal WebSocket client (RFC 6455) for GraphQL subscriptions.
+
+Only what the GraphQL over WebSocket protocol needs is implemented: text
+messages, fragmentation, ping / pong and the closing handshake.
+"""
+
+import base64
+import contextlib
+import hashlib
+import os
+import socket
+import ssl
+import struct
+
+from httpx import URL
+
+from . import errors
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OP_CONTINUATION = 0x0
+_OP_TEXT = 0x1
+_OP_BINARY = 0x2
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+# payload length markers for 16 and 64 bit extended lengths
+_LENGTH_16 = 126
+_LENGTH_64 = 127
+_CLOSE_CODE = struct.Struct("!H")
+_CLOSE_NO_STATUS = 1005
+_MAX_HEADER_SIZE = 64 * 1024
+
+
+def _ssl_context(verify: ssl.SSLContext | bool) -> ssl.SSLContext:
+    if isinstance(verify, ssl.SSLContext):
+        return verify
+    context = ssl.create_default_context()
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class WebSocket:
+    def __init__(self, sock: socket.socket, buffer: bytes = b""):
+        self._sock = sock
+        self._buffer = bytearray(buffer)
+
+    @classmethod
+    def connect(
+        cls,
+        url: URL,
+        *,
+        subprotocol: str,
+        headers: dict | None = None,
+        verify: ssl.SSLContext | bool = True,
+        timeout: float | None = None,
+    ) -> "WebSocket":
+        """Open a WebSocket connection, url has a ws:// or wss:// scheme.
+
+        Raises `errors.WebSocketHandshakeError` if the server does not accept
+        the connection with the requested subprotocol.
+        """
+        port = url.port or (443 if url.scheme == "wss" else 80)
+        sock = socket.create_connection((url.host, port), timeout=timeout)
+        try:
+            if url.scheme == "wss":
+                sock = _ssl_context(verify).wrap_socket(sock, server_hostname=url.host)
+            buffer = cls._handshake(sock, url, subprotocol, headers or {})
+        except BaseException:
+            sock.close()
+            raise
+        return cls(sock, buffer)
+
+    @staticmethod
+    def _handshake(sock, url: URL, subprotocol: str, headers: dict) -> bytes:
+        key = base64.b64encode(os.urandom(16)).decode()
+        host = url.host if url.port is None else f"{url.host}:{url.port}"
+        request_headers = {
+            "Host": host,
+            "Upgrade": "websocket",
+            "Connection": "Upgrade",
+            "Sec-WebSocket-Key": key,
+            "Sec-WebSocket-Version": "13",
+            "Sec-WebSocket-Protocol": subprotocol,
+            **headers,
+        }
+        target = url.raw_path.decode()
+        request = f"GET {target} HTTP/1.1\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in request_headers.items()
+        )
+        sock.sendall(request.encode() + b"\r\n")
+
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(4096)
+            if not chunk or len(response) > _MAX_HEADER_SIZE:
+                error = "connection closed during handshake"
+                raise errors.WebSocketHandshakeError(error)
+            response += chunk
+        head, _, rest = response.partition(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if status_line.split(" ")[1:2] != ["101"]:
+            raise errors.WebSocketHandshakeError(status_line)
+        accept = base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest())  # noqa: S324 (required by RFC 6455)
+        if response_headers.get("sec-websocket-accept") != accept.decode():
+            error = "invalid Sec-WebSocket-Accept"
+            raise errors.WebSocketHandshakeError(error)
+        if response_headers.get("sec-websocket-protocol") != subprotocol:
+            error = f"subprotocol {subprotocol} refused"
+            raise errors.WebSocketHandshakeError(error)
+        return rest
+
+    def settimeout(self, timeout: float | None):
+        self._sock.settimeout(timeout)
+
+    def send(self, text: str):
+        self._send_frame(_OP_TEXT, text.encode())
+
+    def recv(self) -> str:
+        """Receive the next text message, answering pings on the way.
+
+        Raises `errors.WebSocketClosed` when the connection is closed.
+        """
+        message = bytearray()
+        while True:
+            fin, opcode, payload = self._recv_frame()
+            if opcode == _OP_PING:
+                self._send_frame(_OP_PONG, payload)
+            elif opcode == _OP_CLOSE:
+                code = _CLOSE_NO_STATUS
+                if len(payload) >= _CLOSE_CODE.size:
+                    (code,) = _CLOSE_CODE.unpack_from(payload)
+                self._close_socket(reply=payload[: _CLOSE_CODE.size])
+                reason = payload[_CLOSE_CODE.size :].decode(errors="replace")
+                raise errors.WebSocketClosed(code, reason)
+            elif opcode in (_OP_TEXT, _OP_BINARY, _OP_CONTINUATION):
+                message += payload
+                if fin:
+                    return message.decode()
+
+    def close(self, code: int = 1000):
+        self._close_socket(reply=_CLOSE_CODE.pack(code))
+
+    def _close_socket(self, reply: bytes):
+        with contextlib.suppress(OSError):
+            self._send_frame(_OP_CLOSE, reply)
+        self._sock.close()
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < _LENGTH_16:
+            header.append(0x80 | length)
+        elif length < 1 << 16:
+            header.append(0x80 | _LENGTH_16)
+            header += struct.pack("!H", length)
+        else:
+            header.append(0x80 | _LENGTH_64)
+            header += struct.pack("!Q", length)
+        mask = os.urandom(4)
+        header += mask
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self._sock.sendall(bytes(header) + masked)
+
+    def _recv_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            chunk = self._sock.recv(max(4096, size - len(self._buffer)))
+            if not chunk:
+                raise errors.WebSocketClosed(1006, "connection lost")
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _recv_frame(self) -> tuple[bool, int, bytes]:
+        first, second = self._recv_exact(2)
+        length = second & 0x7F
+        if length == _LENGTH_16:
+            (length,) = struct.unpack("!H", self._recv_exact(2))
+        elif length == _LENGTH_64:
+            (length,) = struct.unpack("!Q", self._recv_exact(8))
+        mask = self._recv_exact(4) if second & 0x80 else None
+        payload = self._recv_exact(length)
+        if mask is not None:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return bool(first & 0x80), first & 0x0F, payload